@@ -0,0 +1,147 @@
+"""
+Algorithm throughput benchmark
+Runs ConduitBufferAlgorithm headless on synthetic networks and reports
+conduits/s for buffering, output writing and DXF export
+
+Usage: python benchmarks/bench_algorithm.py [--sizes 1000 10000 100000]
+       [--scenarios memory gpkg dxf] [--widths 300:30 600:10 1800:1]
+       [--workers N] [--json results.json]
+
+Needs a QGIS install whose Python can import qgis.core (QGIS_PREFIX_PATH
+may have to be set). Compare the JSON of two plugin versions to catch
+regressions.
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from synthetic_network import WIDTHS, generate_network, write_network  # noqa: E402
+
+OUTPUTS = ['OUTPUT_CONDUITS', 'OUTPUT_WALLS', 'OUTPUT_EXCAVATION', 'OUTPUT_TOTAL']
+
+
+def run_algorithm(input_path, folder, scenario, workers):
+    """Run the algorithm once and return (elapsed seconds, run profile dict)."""
+    from qgis.core import QgsProcessingContext, QgsProcessingFeedback
+    from conduit_buffer_plugin.conduit_buffer_algorithm import ConduitBufferAlgorithm
+
+    profile_path = os.path.join(folder, f'{scenario}_profile.json')
+    parameters = {
+        'INPUT': input_path,
+        'WIDTH_FIELD': 'condwidth',
+        'DIMENSION_UNIT': 0,
+        'WALL_THICKNESS': 0.15,
+        'EXCAVATION_WIDTH': 0.5,
+        'EXPORT_DXF': scenario == 'dxf',
+        'DXF_FOLDER': folder,
+        'WORKERS': workers,
+        'OUTPUT_PROFILE': profile_path
+    }
+    for output in OUTPUTS:
+        if scenario == 'memory':
+            parameters[output] = 'TEMPORARY_OUTPUT'
+        else:
+            parameters[output] = os.path.join(folder, f'{scenario}_{output.lower()}.gpkg')
+
+    algorithm = ConduitBufferAlgorithm().create()
+    context = QgsProcessingContext()
+    feedback = QgsProcessingFeedback()
+    start = time.perf_counter()
+    _, ok = algorithm.run(parameters, context, feedback)
+    elapsed = time.perf_counter() - start
+    if not ok:
+        raise RuntimeError(f'{scenario} run failed')
+    with open(profile_path, encoding='utf-8') as f:
+        return elapsed, json.load(f)
+
+
+def stage_seconds(profile, *names):
+    return sum(profile['stages'].get(name, {}).get('seconds', 0.0) for name in names)
+
+
+def rate(count, seconds):
+    """Items per second, None when the stage did not run."""
+    return count / seconds if seconds > 0 else None
+
+
+def width_weight(text):
+    """Parse WIDTH_MM[:WEIGHT] (weight 1 by default)."""
+    width, _, weight = text.partition(':')
+    return float(width), float(weight or 1)
+
+
+def format_rate(value, width, decimals=0):
+    return f'{value:{width}.{decimals}f}' if value is not None else f'{"-":>{width}}'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--scenarios', nargs='+', default=['memory', 'gpkg', 'dxf'],
+                        choices=['memory', 'gpkg', 'dxf'])
+    parser.add_argument('--vertices', type=int, default=2)
+    parser.add_argument('--circular', type=float, default=0.7)
+    parser.add_argument('--widths', type=width_weight, nargs='+', default=WIDTHS, metavar='WIDTH_MM[:WEIGHT]',
+                        help='conduit widths and their relative weights (default: commercial sizes)')
+    parser.add_argument('--extra-fields', type=int, default=0)
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--json', help='write the results to this file')
+    args = parser.parse_args()
+
+    from qgis.core import QgsApplication
+    app = QgsApplication([], False)
+    app.initQgis()
+
+    results = []
+    print(f'{"conduits":>9} {"scenario":<8} {"total s":>8} {"conduits/s":>11} '
+          f'{"buffer c/s":>11} {"write c/s":>10} {"dxf c/s":>9} {"dxf MB/s":>9}')
+    try:
+        for size in args.sizes:
+            with tempfile.TemporaryDirectory() as folder:
+                input_path = os.path.join(folder, 'network.gpkg')
+                write_network(input_path, generate_network(size, args.vertices, args.circular, args.widths),
+                              extra_fields=args.extra_fields)
+                for scenario in args.scenarios:
+                    elapsed, profile = run_algorithm(input_path, folder, scenario, args.workers)
+                    buffer_s = stage_seconds(profile, 'buffer', 'difference')
+                    write_s = stage_seconds(profile, 'write')
+                    dxf_s = stage_seconds(profile, 'dxf mesh', 'dxf write')
+                    dxf_chars = profile['stages'].get('dxf write', {}).get('items', 0)
+                    result = {
+                        'conduits': size,
+                        'scenario': scenario,
+                        'seconds': elapsed,
+                        'conduits_per_s': size / elapsed,
+                        'buffer_s': buffer_s,
+                        'buffer_conduits_per_s': rate(size, buffer_s),
+                        'write_s': write_s,
+                        'write_conduits_per_s': rate(size, write_s),
+                        'dxf_s': dxf_s,
+                        'dxf_conduits_per_s': rate(size, dxf_s) if dxf_chars else None,
+                        'dxf_mb_per_s': rate(dxf_chars / 1e6, dxf_s),
+                        'profile': profile
+                    }
+                    results.append(result)
+                    print(f'{size:>9} {scenario:<8} {elapsed:8.2f} {result["conduits_per_s"]:11.0f} '
+                          f'{format_rate(result["buffer_conduits_per_s"], 11)} '
+                          f'{format_rate(result["write_conduits_per_s"], 10)} '
+                          f'{format_rate(result["dxf_conduits_per_s"], 9)} '
+                          f'{format_rate(result["dxf_mb_per_s"], 9, 1)}')
+    finally:
+        app.exitQgis()
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'workers': args.workers, 'vertices': args.vertices,
+                       'circular': args.circular, 'widths': args.widths, 'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""
+DXF writer throughput benchmark
+Compares the buffered DxfWriter with per-field f.write calls, in MB/s
+
+Usage: python benchmarks/bench_dxf_writer.py [segments]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from conduit_buffer_plugin.conduit_buffer_dxf import DxfWriter  # noqa: E402
+from conduit_buffer_plugin.conduit_buffer_mesh import conduit_mesh, invert_levels  # noqa: E402
+
+
+def synthetic_faces(segments, seed=0):
+    """Return (layer, color, points) batches for ``segments`` circular segments."""
+    rng = np.random.default_rng(seed)
+    batches = []
+    remaining = segments
+    while remaining > 0:
+        n = min(remaining, 5)
+        xy = np.cumsum(rng.uniform(-50, 50, size=(n + 1, 2)), axis=0) + (500000.0, 9000000.0)
+        mesh = conduit_mesh(xy, invert_levels(xy, 100.0, 98.5), 'Circular', 0.6, 0.6)
+        batches.append(('CONDUITS_CIRCULAR', 1, mesh.vertices[mesh.faces]))
+        remaining -= n
+    return batches
+
+
+def write_per_field(path, batches):
+    """Reference writer: one f.write per group code, as in plugin version 2."""
+    with open(path, 'w') as f:
+        f.write("  0\nSECTION\n  2\nENTITIES\n")
+        for layer, color, points in batches:
+            for pts in points.tolist():
+                f.write("  0\n3DFACE\n")
+                f.write(f"  8\n{layer}\n")
+                f.write(f" 62\n{color}\n")
+                for code, idx in [(10, 0), (11, 1), (12, 2), (13, 3)]:
+                    f.write(f" {code}\n{pts[idx][0]:.6f}\n")
+                    f.write(f" {code+10}\n{pts[idx][1]:.6f}\n")
+                    f.write(f" {code+20}\n{pts[idx][2]:.6f}\n")
+                f.write(" 70\n0\n")
+        f.write("  0\nENDSEC\n  0\nEOF\n")
+
+
+def write_buffered(path, batches, buffer_size):
+    with DxfWriter(path, buffer_size) as dxf:
+        dxf.write("  0\nSECTION\n  2\nENTITIES\n")
+        for layer, color, points in batches:
+            dxf.write_3dfaces(layer, color, points)
+
+
+def measure(label, func, path):
+    start = time.perf_counter()
+    func(path)
+    elapsed = time.perf_counter() - start
+    size_mb = os.path.getsize(path) / 1e6
+    print(f'{label:<28} {size_mb:8.1f} MB {elapsed:8.2f} s {size_mb / elapsed:8.1f} MB/s')
+
+
+def main():
+    segments = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    batches = synthetic_faces(segments)
+    faces = sum(len(points) for _, _, points in batches)
+    print(f'{segments} circular segments, {faces} 3DFACE entities')
+
+    with tempfile.TemporaryDirectory() as folder:
+        reference = os.path.join(folder, 'per_field.dxf')
+        measure('per-field f.write', lambda p: write_per_field(p, batches), reference)
+        for buffer_size in (64 << 10, 1 << 20, 8 << 20):
+            path = os.path.join(folder, f'buffered_{buffer_size}.dxf')
+            measure(f'DxfWriter ({buffer_size >> 10} KiB)',
+                    lambda p: write_buffered(p, batches, buffer_size), path)
+            with open(reference, 'rb') as a, open(path, 'rb') as b:
+                if a.read() != b.read():
+                    print('  output differs from per-field writer')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+"""
+Synthetic InfoWorks-style conduit networks
+Generates drainage networks of any size with condwidth, condheight and
+inverts filled in, and writes them to a GeoPackage through qgis.core
+
+Usage: python benchmarks/synthetic_network.py output.gpkg [count]
+"""
+
+import math
+import random
+import sys
+
+
+# Anchos comerciales (mm) y su peso relativo
+WIDTHS = [(300, 30), (400, 20), (500, 15), (600, 12), (800, 8), (1000, 6),
+          (1200, 4), (1500, 3), (1800, 2)]
+# Altos de las secciones rectangulares (mm)
+BOX_HEIGHTS = [600, 900, 1200, 1500]
+# Coordenadas de origen (UTM 18S)
+ORIGIN = (500000.0, 8660000.0)
+
+
+def generate_network(count, vertices=2, circular=0.7, widths=WIDTHS, link_length=50.0, seed=0):
+    """Return ``count`` conduit dicts forming branched pipe runs.
+
+    Runs of 5 to 40 conduits start from random points and wander between
+    manholes ``link_length`` apart, sloping down at 0.5 to 2 %. Each
+    conduit has ``vertices`` points (at least 2); a share ``circular`` of
+    the runs are circular (condheight = condwidth) and the rest boxes.
+    ``widths`` is a list of (width mm, weight). Conduits of a run share
+    their end nodes and section, like an InfoWorks export, so they can be
+    chained. Ids follow the InfoWorks ``us_node.suffix`` pattern.
+    """
+    rng = random.Random(seed)
+    side = math.sqrt(count) * link_length * 2
+    sizes = [width for width, _ in widths]
+    weights = [weight for _, weight in widths]
+    vertices = max(2, vertices)
+    conduits = []
+    run = 0
+    while len(conduits) < count:
+        run += 1
+        width = rng.choices(sizes, weights)[0]
+        height = width if rng.random() < circular else rng.choice(BOX_HEIGHTS)
+        x, y = ORIGIN[0] + rng.uniform(0, side), ORIGIN[1] + rng.uniform(0, side)
+        heading = rng.uniform(0, 2 * math.pi)
+        invert = rng.uniform(80.0, 120.0)
+        for link in range(rng.randint(5, 40)):
+            if len(conduits) >= count:
+                break
+            heading += rng.gauss(0, 0.25)
+            x1 = x + link_length * math.cos(heading)
+            y1 = y + link_length * math.sin(heading)
+            points = [(x, y)]
+            for k in range(1, vertices - 1):
+                t = k / (vertices - 1)
+                points.append((x + (x1 - x) * t + rng.gauss(0, 0.5),
+                               y + (y1 - y) * t + rng.gauss(0, 0.5)))
+            points.append((x1, y1))
+            ds_invert = invert - link_length * rng.uniform(0.005, 0.02)
+            conduits.append({
+                'id': f'MH{run:05d}{link:02d}.1',
+                'condwidth': float(width),
+                'condheight': float(height),
+                'us_invert': round(invert, 3),
+                'ds_invert': round(ds_invert, 3),
+                'points': points
+            })
+            x, y, invert = x1, y1, ds_invert
+    return conduits
+
+
+def write_network(path, conduits, crs='EPSG:32718', extra_fields=0):
+    """Write ``conduits`` to the GeoPackage ``path`` with qgis.core.
+
+    ``extra_fields`` adds unused text columns, as in wide InfoWorks exports.
+    """
+    from qgis.PyQt.QtCore import QVariant
+    from qgis.core import (QgsCoordinateReferenceSystem, QgsCoordinateTransformContext,
+                           QgsFeature, QgsField, QgsFields, QgsGeometry, QgsPointXY,
+                           QgsVectorFileWriter, QgsWkbTypes)
+
+    fields = QgsFields()
+    fields.append(QgsField('id', QVariant.String, len=50))
+    for name in ('condwidth', 'condheight', 'us_invert', 'ds_invert'):
+        fields.append(QgsField(name, QVariant.Double))
+    for i in range(extra_fields):
+        fields.append(QgsField(f'extra_{i:03d}', QVariant.String, len=20))
+
+    options = QgsVectorFileWriter.SaveVectorOptions()
+    options.driverName = 'GPKG'
+    options.layerName = 'conduits'
+    writer = QgsVectorFileWriter.create(path, fields, QgsWkbTypes.LineString,
+                                        QgsCoordinateReferenceSystem(crs),
+                                        QgsCoordinateTransformContext(), options)
+    if writer.hasError() != QgsVectorFileWriter.NoError:
+        raise IOError(writer.errorMessage())
+    padding = ['x' * 20] * extra_fields
+    for conduit in conduits:
+        feature = QgsFeature(fields)
+        feature.setGeometry(QgsGeometry.fromPolylineXY([QgsPointXY(x, y) for x, y in conduit['points']]))
+        feature.setAttributes([conduit['id'], conduit['condwidth'], conduit['condheight'],
+                               conduit['us_invert'], conduit['ds_invert']] + padding)
+        writer.addFeature(feature)
+    del writer
+
+
+def main():
+    from qgis.core import QgsApplication
+
+    path = sys.argv[1]
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    app = QgsApplication([], False)
+    app.initQgis()
+    write_network(path, generate_network(count))
+    print(f'{count} conduits written to {path}')
+    app.exitQgis()
+
+
+if __name__ == '__main__':
+    main()
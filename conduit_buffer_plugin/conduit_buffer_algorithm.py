@@ -12,15 +12,41 @@ from qgis.core import (QgsProcessing,
                        QgsProcessingParameterNumber,
                        QgsProcessingParameterBoolean,
                        QgsProcessingParameterFolderDestination,
+                       QgsProcessingParameterFileDestination,
                        QgsProcessingParameterFeatureSink,
+                       QgsProcessingParameterRasterLayer,
+                       QgsProcessingParameterDefinition,
                        QgsProcessingException,
+                       QgsApplication,
                        QgsFeature,
+                       QgsGeometry,
+                       QgsPointXY,
                        QgsFields,
                        QgsField,
                        QgsWkbTypes,
                        QgsFeatureSink)
 import math
 import os
+import time
+
+import numpy as np
+
+from .conduit_buffer_cache import BufferCache
+from .conduit_buffer_clash import ClashDetector, end_nodes
+from .conduit_buffer_dem import DemSampler, trench_profile
+from .conduit_buffer_dxf import DxfConduitExporter
+from .conduit_buffer_export3d import MeshConduitExporter
+from .conduit_buffer_footprint import FootprintDissolver
+from .conduit_buffer_geometry import concentric_buffers, conduit_rings, vertex_count
+from .conduit_buffer_gpkg import GeoPackageLayers
+from .conduit_buffer_incremental import IncrementalStore
+from .conduit_buffer_mesh import CIRCULAR, RECTANGULAR, invert_levels, part_levels
+from .conduit_buffer_network import chain_conduits
+from .conduit_buffer_parallel import BackgroundConsumer, chunked, ordered_map
+from .conduit_buffer_profile import RunProfile
+from .conduit_buffer_reader import ConduitReader, classify_sections
+from .conduit_buffer_sinks import SINK_BATCH_SIZE, BatchedSinks
+from .conduit_buffer_tiles import tile_grid
 
 
 class ConduitBufferAlgorithm(QgsProcessingAlgorithm):
@@ -33,12 +59,31 @@ class ConduitBufferAlgorithm(QgsProcessingAlgorithm):
     EXCAVATION_WIDTH = 'EXCAVATION_WIDTH'
     EXPORT_DXF = 'EXPORT_DXF'
     DXF_FOLDER = 'DXF_FOLDER'
+    DXF_ENTITIES = 'DXF_ENTITIES'
+    DXF_GEOMETRY = 'DXF_GEOMETRY'
+    MESH_FORMATS = 'MESH_FORMATS'
+    DEM = 'DEM'
+    CHAIN_RUNS = 'CHAIN_RUNS'
+    CHORD_TOLERANCE = 'CHORD_TOLERANCE'
+    USE_CACHE = 'USE_CACHE'
+    CACHE_SIZE = 'CACHE_SIZE'
+    INCREMENTAL_GPKG = 'INCREMENTAL_GPKG'
+    WORKERS = 'WORKERS'
+    CHUNK_SIZE = 'CHUNK_SIZE'
+    DXF_BACKGROUND = 'DXF_BACKGROUND'
+    SINK_BATCH_SIZE = 'SINK_BATCH_SIZE'
+    OUTPUT_GPKG = 'OUTPUT_GPKG'
+    TILE_SIZE = 'TILE_SIZE'
+    TILE_FOLDER = 'TILE_FOLDER'
+    OUTPUT_PROFILE = 'OUTPUT_PROFILE'
 
     # Outputs
     OUTPUT_CONDUITS = 'OUTPUT_CONDUITS'
     OUTPUT_WALLS = 'OUTPUT_WALLS'
     OUTPUT_EXCAVATION = 'OUTPUT_EXCAVATION'
     OUTPUT_TOTAL = 'OUTPUT_TOTAL'
+    OUTPUT_FOOTPRINT = 'OUTPUT_FOOTPRINT'
+    OUTPUT_CLASHES = 'OUTPUT_CLASHES'
 
     def tr(self, string):
         return QCoreApplication.translate('Processing', string)
@@ -142,31 +187,222 @@ class ConduitBufferAlgorithm(QgsProcessingAlgorithm):
             )
         )
 
+        self.addParameter(
+            QgsProcessingParameterEnum(
+                self.DXF_ENTITIES,
+                self.tr('DXF entity type'),
+                options=[self.tr('3DFACE'), self.tr('POLYFACE MESH (shared vertices, smaller file)')],
+                defaultValue=0
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterEnum(
+                self.DXF_GEOMETRY,
+                self.tr('DXF conduit geometry'),
+                options=[self.tr('Closed prism per segment'),
+                         self.tr('Continuous mitered tube per conduit')],
+                defaultValue=0
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterEnum(
+                self.MESH_FORMATS,
+                self.tr('Other 3D formats (written to the DXF folder)'),
+                options=[self.tr('Binary STL (one file per section layer)'),
+                         self.tr('glTF 2.0 (one node per conduit)')],
+                allowMultiple=True,
+                optional=True
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterRasterLayer(
+                self.DEM,
+                self.tr('Ground DEM for cover depth and trench volume'),
+                optional=True
+            )
+        )
+
+        tolerance_param = QgsProcessingParameterNumber(
+            self.CHORD_TOLERANCE,
+            self.tr('Maximum arc chord deviation (meters, 0 = fixed segmentation)'),
+            type=QgsProcessingParameterNumber.Double,
+            defaultValue=0.0,
+            minValue=0.0,
+            maxValue=1.0
+        )
+        tolerance_param.setFlags(tolerance_param.flags() | QgsProcessingParameterDefinition.FlagAdvanced)
+        self.addParameter(tolerance_param)
+
+        cache_param = QgsProcessingParameterBoolean(
+            self.USE_CACHE,
+            self.tr('Reuse buffers from the on-disk cache of previous runs'),
+            defaultValue=False
+        )
+        cache_param.setFlags(cache_param.flags() | QgsProcessingParameterDefinition.FlagAdvanced)
+        self.addParameter(cache_param)
+
+        cache_size_param = QgsProcessingParameterNumber(
+            self.CACHE_SIZE,
+            self.tr('Maximum buffer cache size (MB)'),
+            type=QgsProcessingParameterNumber.Integer,
+            defaultValue=1024,
+            minValue=1
+        )
+        cache_size_param.setFlags(cache_size_param.flags() | QgsProcessingParameterDefinition.FlagAdvanced)
+        self.addParameter(cache_size_param)
+
+        incremental_param = QgsProcessingParameterFileDestination(
+            self.INCREMENTAL_GPKG,
+            self.tr('Incremental GeoPackage (update only changed conduits)'),
+            fileFilter='GeoPackage (*.gpkg)',
+            optional=True,
+            createByDefault=False
+        )
+        incremental_param.setFlags(incremental_param.flags() | QgsProcessingParameterDefinition.FlagAdvanced)
+        self.addParameter(incremental_param)
+
+        chain_param = QgsProcessingParameterBoolean(
+            self.CHAIN_RUNS,
+            self.tr('Chain collinear conduit runs into single features'),
+            defaultValue=False
+        )
+        chain_param.setFlags(chain_param.flags() | QgsProcessingParameterDefinition.FlagAdvanced)
+        self.addParameter(chain_param)
+
+        workers_param = QgsProcessingParameterNumber(
+            self.WORKERS,
+            self.tr('Parallel workers (1 = single thread)'),
+            type=QgsProcessingParameterNumber.Integer,
+            defaultValue=1,
+            minValue=1,
+            maxValue=128
+        )
+        workers_param.setFlags(workers_param.flags() | QgsProcessingParameterDefinition.FlagAdvanced)
+        self.addParameter(workers_param)
+
+        chunk_param = QgsProcessingParameterNumber(
+            self.CHUNK_SIZE,
+            self.tr('Conduits per parallel chunk'),
+            type=QgsProcessingParameterNumber.Integer,
+            defaultValue=500,
+            minValue=1
+        )
+        chunk_param.setFlags(chunk_param.flags() | QgsProcessingParameterDefinition.FlagAdvanced)
+        self.addParameter(chunk_param)
+
+        background_param = QgsProcessingParameterBoolean(
+            self.DXF_BACKGROUND,
+            self.tr('Write DXF on a background thread while buffering'),
+            defaultValue=True
+        )
+        background_param.setFlags(background_param.flags() | QgsProcessingParameterDefinition.FlagAdvanced)
+        self.addParameter(background_param)
+
+        sink_batch_param = QgsProcessingParameterNumber(
+            self.SINK_BATCH_SIZE,
+            self.tr('Features per output write batch'),
+            type=QgsProcessingParameterNumber.Integer,
+            defaultValue=SINK_BATCH_SIZE,
+            minValue=1
+        )
+        sink_batch_param.setFlags(sink_batch_param.flags() | QgsProcessingParameterDefinition.FlagAdvanced)
+        self.addParameter(sink_batch_param)
+
+        gpkg_param = QgsProcessingParameterFileDestination(
+            self.OUTPUT_GPKG,
+            self.tr('Single GeoPackage with all outputs (one transaction)'),
+            fileFilter='GeoPackage (*.gpkg)',
+            optional=True,
+            createByDefault=False
+        )
+        gpkg_param.setFlags(gpkg_param.flags() | QgsProcessingParameterDefinition.FlagAdvanced)
+        self.addParameter(gpkg_param)
+
+        tile_size_param = QgsProcessingParameterNumber(
+            self.TILE_SIZE,
+            self.tr('Tile size in map units (0 = no tiling)'),
+            type=QgsProcessingParameterNumber.Double,
+            defaultValue=0.0,
+            minValue=0.0
+        )
+        tile_size_param.setFlags(tile_size_param.flags() | QgsProcessingParameterDefinition.FlagAdvanced)
+        self.addParameter(tile_size_param)
+
+        tile_folder_param = QgsProcessingParameterFolderDestination(
+            self.TILE_FOLDER,
+            self.tr('Folder for per-tile GeoPackages'),
+            optional=True,
+            createByDefault=False
+        )
+        tile_folder_param.setFlags(tile_folder_param.flags() | QgsProcessingParameterDefinition.FlagAdvanced)
+        self.addParameter(tile_folder_param)
+
+        profile_param = QgsProcessingParameterFileDestination(
+            self.OUTPUT_PROFILE,
+            self.tr('Run profile (JSON)'),
+            fileFilter='JSON (*.json)',
+            optional=True,
+            createByDefault=False
+        )
+        profile_param.setFlags(profile_param.flags() | QgsProcessingParameterDefinition.FlagAdvanced)
+        self.addParameter(profile_param)
+
         self.addParameter(
             QgsProcessingParameterFeatureSink(
                 self.OUTPUT_CONDUITS,
-                self.tr('Output conduits')
+                self.tr('Output conduits'),
+                optional=True,
+                createByDefault=True
             )
         )
 
         self.addParameter(
             QgsProcessingParameterFeatureSink(
                 self.OUTPUT_WALLS,
-                self.tr('Output walls')
+                self.tr('Output walls'),
+                optional=True,
+                createByDefault=True
             )
         )
 
         self.addParameter(
             QgsProcessingParameterFeatureSink(
                 self.OUTPUT_EXCAVATION,
-                self.tr('Output excavation')
+                self.tr('Output excavation'),
+                optional=True,
+                createByDefault=True
             )
         )
 
         self.addParameter(
             QgsProcessingParameterFeatureSink(
                 self.OUTPUT_TOTAL,
-                self.tr('Output total width')
+                self.tr('Output total width'),
+                optional=True,
+                createByDefault=True
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterFeatureSink(
+                self.OUTPUT_FOOTPRINT,
+                self.tr('Dissolved footprint'),
+                type=QgsProcessing.TypeVectorPolygon,
+                optional=True,
+                createByDefault=False
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterFeatureSink(
+                self.OUTPUT_CLASHES,
+                self.tr('Excavation clashes'),
+                type=QgsProcessing.TypeVectorPolygon,
+                optional=True,
+                createByDefault=False
             )
         )
 
@@ -182,14 +418,41 @@ class ConduitBufferAlgorithm(QgsProcessingAlgorithm):
         excavation_width = self.parameterAsDouble(parameters, self.EXCAVATION_WIDTH, context)
         export_dxf = self.parameterAsBool(parameters, self.EXPORT_DXF, context)
         dxf_folder = self.parameterAsString(parameters, self.DXF_FOLDER, context)
+        polyface = self.parameterAsEnum(parameters, self.DXF_ENTITIES, context) == 1
+        tube = self.parameterAsEnum(parameters, self.DXF_GEOMETRY, context) == 1
+        mesh_formats = self.parameterAsEnums(parameters, self.MESH_FORMATS, context)
+        chain_runs = self.parameterAsBool(parameters, self.CHAIN_RUNS, context)
+        chord_tolerance = self.parameterAsDouble(parameters, self.CHORD_TOLERANCE, context)
+        use_cache = self.parameterAsBool(parameters, self.USE_CACHE, context)
+        cache_size = self.parameterAsInt(parameters, self.CACHE_SIZE, context)
+        incremental_path = self.parameterAsFileOutput(parameters, self.INCREMENTAL_GPKG, context)
+        workers = self.parameterAsInt(parameters, self.WORKERS, context)
+        chunk_size = self.parameterAsInt(parameters, self.CHUNK_SIZE, context)
+        dxf_background = self.parameterAsBool(parameters, self.DXF_BACKGROUND, context)
+        sink_batch_size = self.parameterAsInt(parameters, self.SINK_BATCH_SIZE, context)
+        gpkg_path = self.parameterAsFileOutput(parameters, self.OUTPUT_GPKG, context)
+        tile_size = self.parameterAsDouble(parameters, self.TILE_SIZE, context)
+        tile_folder = self.parameterAsString(parameters, self.TILE_FOLDER, context)
+        dem_layer = self.parameterAsRasterLayer(parameters, self.DEM, context)
+        profile_path = self.parameterAsFileOutput(parameters, self.OUTPUT_PROFILE, context)
+        profile = RunProfile()
 
         feedback.pushInfo(f'Width field: {width_field}')
         feedback.pushInfo(f'Wall thickness: {wall_thickness}m')
         feedback.pushInfo(f'Excavation width: {excavation_width}m')
         feedback.pushInfo(f'Export DXF: {export_dxf}')
-
-        conversion_factor = 0.001 if dimension_unit == 0 else 1.0
-        field_names = [f.name() for f in source.fields()]
+        feedback.pushInfo(f'Workers: {workers}')
+        if chord_tolerance > 0:
+            feedback.pushInfo(f'Chord tolerance: {chord_tolerance}m')
+        if tile_folder and tile_size <= 0:
+            feedback.reportError('Per-tile output needs a tile size, writing merged outputs only')
+            tile_folder = ''
+        if incremental_path and (gpkg_path or tile_folder):
+            # Los conductos sin cambios no se reescriben: esas salidas quedarían incompletas
+            raise QgsProcessingException(self.tr(
+                'The incremental GeoPackage only rewrites changed conduits, so it cannot be combined '
+                'with the single GeoPackage or per-tile GeoPackage outputs, which are recreated on '
+                'every run. The incremental GeoPackage already holds the four complete layers.'))
 
         # Sinks
         conduit_fields = QgsFields()
@@ -213,6 +476,13 @@ class ConduitBufferAlgorithm(QgsProcessingAlgorithm):
         excavation_fields = QgsFields()
         excavation_fields.append(QgsField('id', QVariant.String, len=50))
         excavation_fields.append(QgsField('ancho_m', QVariant.Double))
+        dem = None
+        if dem_layer is not None:
+            dem = DemSampler(dem_layer, source.sourceCrs(), context.transformContext())
+            excavation_fields.append(QgsField('recubr_min', QVariant.Double))
+            excavation_fields.append(QgsField('recubr_med', QVariant.Double))
+            excavation_fields.append(QgsField('vol_m3', QVariant.Double))
+            feedback.pushInfo(f'DEM: {dem_layer.name()}')
         (sink_excavation, dest_id_excavation) = self.parameterAsSink(
             parameters, self.OUTPUT_EXCAVATION, context,
             excavation_fields, QgsWkbTypes.Polygon, source.sourceCrs())
@@ -224,234 +494,489 @@ class ConduitBufferAlgorithm(QgsProcessingAlgorithm):
             parameters, self.OUTPUT_TOTAL, context,
             total_fields, QgsWkbTypes.Polygon, source.sourceCrs())
 
-        dxf_conduits = []
-        total = 100.0 / source.featureCount() if source.featureCount() else 0
+        footprint_fields = QgsFields()
+        footprint_fields.append(QgsField('cluster', QVariant.Int))
+        footprint_fields.append(QgsField('conductos', QVariant.Int))
+        footprint_fields.append(QgsField('area_m2', QVariant.Double))
+        (sink_footprint, dest_id_footprint) = self.parameterAsSink(
+            parameters, self.OUTPUT_FOOTPRINT, context,
+            footprint_fields, QgsWkbTypes.MultiPolygon, source.sourceCrs())
+        footprint = FootprintDissolver() if sink_footprint is not None else None
+
+        clash_fields = QgsFields()
+        clash_fields.append(QgsField('id_a', QVariant.String, len=50))
+        clash_fields.append(QgsField('id_b', QVariant.String, len=50))
+        clash_fields.append(QgsField('area_m2', QVariant.Double))
+        (sink_clashes, dest_id_clashes) = self.parameterAsSink(
+            parameters, self.OUTPUT_CLASHES, context,
+            clash_fields, QgsWkbTypes.MultiPolygon, source.sourceCrs())
+        clashes = ClashDetector() if sink_clashes is not None else None
 
-        for current, feature in enumerate(source.getFeatures()):
-            if feedback.isCanceled():
-                break
+        total = 100.0 / source.featureCount() if source.featureCount() else 0
 
-            conduit_id = str(feature['id']) if 'id' in field_names else str(feature.id())
+        cache = None
+        if use_cache:
+            cache = BufferCache(self._cache_path(), cache_size * 1024 * 1024)
+            feedback.pushInfo(f'Buffer cache: {cache.path}')
+
+        layer_fields = {'conduits': conduit_fields, 'walls': wall_fields,
+                        'excavation': excavation_fields, 'total_width': total_fields}
+
+        incremental = None
+        if incremental_path:
+            incremental = IncrementalStore(
+                incremental_path,
+                layer_fields,
+                source.sourceCrs().toWkt(),
+                (dimension_unit, wall_thickness, excavation_width, chord_tolerance,
+                 dem_layer.source() if dem_layer is not None else None))
+            feedback.pushInfo(f'Incremental GeoPackage: {incremental_path}')
+
+        sinks = BatchedSinks({
+            self.OUTPUT_CONDUITS: sink_conduits,
+            self.OUTPUT_WALLS: sink_walls,
+            self.OUTPUT_EXCAVATION: sink_excavation,
+            self.OUTPUT_TOTAL: sink_total
+        }, sink_batch_size)
+        store_layers = {
+            self.OUTPUT_CONDUITS: 'conduits',
+            self.OUTPUT_WALLS: 'walls',
+            self.OUTPUT_EXCAVATION: 'excavation',
+            self.OUTPUT_TOTAL: 'total_width'
+        }
 
-            width = feature[width_field]
-            if width is None:
-                feedback.reportError(f'Feature {conduit_id}: null width, skipping...')
-                continue
+        gpkg = None
+        if gpkg_path:
+            gpkg = self._open_gpkg(gpkg_path, source.sourceCrs().toWkt(), layer_fields)
+            feedback.pushInfo(f'GeoPackage: {gpkg_path}')
 
-            width_mm = width if dimension_unit == 0 else width * 1000
+        tile_gpkg = None
+        if tile_folder:
+            os.makedirs(tile_folder, exist_ok=True)
 
-            # condheight: solo para clasificar y para DXF
-            condheight_mm = None
-            if 'condheight' in field_names:
-                ch = feature['condheight']
-                if ch is not None:
-                    condheight_mm = ch if dimension_unit == 0 else ch * 1000
-
-            if condheight_mm and abs(width_mm - condheight_mm) < 1:
-                tipo_seccion = 'Circular'
-                ancho_mm, alto_mm, diam_mm = None, None, width_mm
-            else:
-                tipo_seccion = 'Rectangular'
-                ancho_mm, alto_mm, diam_mm = width_mm, condheight_mm, None
-
-            geom = feature.geometry()
-            longitud_m = geom.length()
-            conduit_radius_m = (width_mm * conversion_factor) / 2.0
-
-            # 1. Conduit buffer
-            conduit_buffer = geom.buffer(conduit_radius_m, 25)
-            cf = QgsFeature()
-            cf.setGeometry(conduit_buffer)
-            cf.setAttributes([conduit_id, tipo_seccion, ancho_mm, alto_mm, diam_mm, longitud_m])
-            sink_conduits.addFeature(cf, QgsFeatureSink.FastInsert)
-
-            # 2. Walls
-            wall_geom = geom.buffer(conduit_radius_m + wall_thickness, 25).difference(conduit_buffer)
-            if not wall_geom.isEmpty():
-                wf = QgsFeature()
-                wf.setGeometry(wall_geom)
-                wf.setAttributes([conduit_id, wall_thickness])
-                sink_walls.addFeature(wf, QgsFeatureSink.FastInsert)
-
-            # 3. Excavation
-            exc_geom = geom.buffer(conduit_radius_m + excavation_width, 25).difference(conduit_buffer)
-            if not exc_geom.isEmpty():
-                ef = QgsFeature()
-                ef.setGeometry(exc_geom)
-                ef.setAttributes([conduit_id, excavation_width])
-                sink_excavation.addFeature(ef, QgsFeatureSink.FastInsert)
-
-            # 4. Total width
-            total_width = conduit_radius_m + excavation_width
-            total_buffer = geom.buffer(total_width, 25)
-            if not total_buffer.isEmpty():
-                tf = QgsFeature()
-                tf.setGeometry(total_buffer)
-                tf.setAttributes([conduit_id, total_width * 2])
-                sink_total.addFeature(tf, QgsFeatureSink.FastInsert)
-
-            # Store for DXF
-            if export_dxf:
-                us_invert = feature['us_invert'] if 'us_invert' in field_names else 0
-                ds_invert = feature['ds_invert'] if 'ds_invert' in field_names else 0
-                if geom.isMultipart():
-                    for part in geom.asGeometryCollection():
-                        coords = list(part.asPolyline())
-                else:
-                    coords = list(geom.asPolyline())
-
-                dxf_conduits.append({
-                    'id': conduit_id,
-                    'tipo': tipo_seccion,
-                    'width_mm': width_mm,
-                    'height_mm': condheight_mm if condheight_mm else width_mm,
-                    'us_invert': us_invert,
-                    'ds_invert': ds_invert,
-                    'coords': coords
-                })
-
-            feedback.setProgress(int(current * total))
-
-        # Export DXF
-        if export_dxf and dxf_conduits and dxf_folder:
-            feedback.pushInfo('=' * 50)
-            feedback.pushInfo('Exporting 3D DXF with 3DFACE...')
+        dxf = meshes = export_queue = None
+        if export_dxf and dxf_folder:
+            feedback.pushInfo('Exporting 3D DXF with {}...'.format('POLYFACE MESH' if polyface else '3DFACE'))
             try:
-                dxf_path = os.path.join(dxf_folder, 'conduits_3d.dxf')
-                self._export_3dface_dxf(dxf_conduits, dxf_path, feedback)
-                feedback.pushInfo(f'✓ DXF: {dxf_path}')
-                feedback.pushInfo('Civil 3D: ConvertToSurface → Thicken')
+                dxf = DxfConduitExporter(
+                    os.path.join(dxf_folder, 'conduits_3d.dxf'), polyface, tube, chord_tolerance,
+                    incremental.fragments if incremental is not None else None, profile=profile)
             except Exception as e:
                 feedback.reportError(f'✗ DXF export error: {str(e)}')
+        if mesh_formats and dxf_folder:
+            try:
+                os.makedirs(dxf_folder, exist_ok=True)
+                meshes = MeshConduitExporter(dxf_folder, 0 in mesh_formats, 1 in mesh_formats,
+                                             tube, chord_tolerance, profile=profile)
+            except Exception as e:
+                feedback.reportError(f'✗ 3D export error: {str(e)}')
+        exporters = [exporter for exporter in (dxf, meshes) if exporter is not None]
+
+        def export_conduit(conduit):
+            for exporter in exporters:
+                exporter.add(conduit)
+
+        if exporters and dxf_background:
+            # El mallado y la escritura 3D corren en paralelo al bucle de buffers
+            export_queue = BackgroundConsumer(export_conduit)
+
+        def buffer_chunk(records):
+            results = []
+            for record in records:
+                if not record.get('unchanged'):
+                    start = time.perf_counter()
+                    rings = conduit_rings(record['geom'], record['radius_m'],
+                                          wall_thickness, excavation_width, chord_tolerance, cache, profile)
+                    profile.conduit(record['id'], time.perf_counter() - start,
+                                    vertex_count(record['geom']))
+                    results.append((record, rings))
+                    continue
+                if footprint is not None or clashes is not None:
+                    # Huella y choques necesitan el ancho total también de los conductos sin cambios
+                    record['total'] = concentric_buffers(
+                        record['geom'], [record['radius_m'] + excavation_width],
+                        tolerance=chord_tolerance, cache=cache)[0]
+                results.append((record, None))
+            return results
+
+        if tile_size > 0:
+            records = self._tile_records(source, width_field, dimension_unit, tile_size, chain_runs, feedback)
+        else:
+            records = self._conduit_records(ConduitReader(source, width_field), dimension_unit, feedback)
+            if chain_runs:
+                records = self._chain_records(list(records), feedback)
+        if incremental is not None:
+            records = incremental.classify(records)
+        records = profile.timed('read', records)
+        for results in ordered_map(buffer_chunk, chunked(records, chunk_size), workers, feedback):
+            if feedback.isCanceled():
+                break
+
+            for record, rings in results:
+                if footprint is not None or clashes is not None:
+                    total_polygon = rings.total if rings is not None else record.pop('total')
+                    if footprint is not None:
+                        start = time.perf_counter()
+                        footprint.add(total_polygon)
+                        profile.add('footprint', time.perf_counter() - start, 1)
+                    if clashes is not None:
+                        start = time.perf_counter()
+                        self._write_clashes(record, total_polygon, record['radius_m'] + excavation_width,
+                                            clashes, sink_clashes)
+                        profile.add('clashes', time.perf_counter() - start, 1)
+
+                conduit = None
+                if rings is not None:
+                    trench = ()
+                    if dem is not None and (record['geom'].isEmpty() or record['us_invert'] is None
+                                            or record['ds_invert'] is None):
+                        # Sin geometría o sin cota de fondo no hay recubrimiento ni volumen
+                        trench = (None, None, None)
+                    elif dem is not None:
+                        # Muestreo en el hilo principal: el proveedor ráster no es thread-safe
+                        start = time.perf_counter()
+                        conduit = self._conduit_profile(record)
+                        trench = trench_profile(dem, conduit['parts'], conduit['height_mm'] / 1000.0,
+                                                2 * (record['radius_m'] + excavation_width))
+                        trench = trench or (None, None, None)
+                        profile.add('dem', time.perf_counter() - start, 1)
+                    start = time.perf_counter()
+                    features = self._ring_features(record, rings, wall_thickness, excavation_width, trench)
+                    sinks.add(features)
+                    if gpkg is not None:
+                        for key, feature in features.items():
+                            gpkg.add_feature(store_layers[key], feature)
+                    if tile_folder:
+                        # Los registros llegan agrupados por tesela
+                        tile = record['tile']
+                        if tile_gpkg is None or tile_gpkg[0] != tile:
+                            if tile_gpkg is not None:
+                                self._close_gpkg(tile_gpkg[1])
+                            tile_path = os.path.join(tile_folder, f'tile_{tile.row}_{tile.column}.gpkg')
+                            tile_gpkg = (tile, self._open_gpkg(tile_path, source.sourceCrs().toWkt(),
+                                                               layer_fields))
+                        for key, feature in features.items():
+                            tile_gpkg[1].add_feature(store_layers[key], feature)
+                    if incremental is not None:
+                        incremental.write(record, {store_layers[key]: feature
+                                                   for key, feature in features.items()})
+                    profile.add('write', time.perf_counter() - start, len(features))
+
+                # Stream to DXF, STL and glTF
+                if exporters:
+                    try:
+                        conduit = conduit or self._conduit_profile(record)
+                        if export_queue is not None:
+                            start = time.perf_counter()
+                            export_queue.put(conduit)
+                            profile.add('export queue', time.perf_counter() - start, 1)
+                        else:
+                            export_conduit(conduit)
+                    except Exception as e:
+                        feedback.reportError(f'✗ 3D export error: {str(e)}')
+                        self._abort_exports(exporters, export_queue)
+                        exporters, export_queue = [], None
+
+            feedback.setProgress(int(results[-1][0]['index'] * total))
+
+        start = time.perf_counter()
+        sinks.flush()
+        profile.add('write', time.perf_counter() - start)
+
+        if footprint is not None and not feedback.isCanceled():
+            start = time.perf_counter()
+            self._write_footprint(footprint, sink_footprint, feedback)
+            profile.add('dissolve', time.perf_counter() - start, len(footprint.geometries))
+        if clashes is not None:
+            feedback.pushInfo(f'Excavation clashes: {clashes.count}')
+        if gpkg is not None:
+            self._close_gpkg(gpkg)
+        if tile_gpkg is not None:
+            self._close_gpkg(tile_gpkg[1])
+
+        if exporters:
+            try:
+                start = time.perf_counter()
+                if export_queue is not None:
+                    export_queue.close()
+                for exporter in exporters:
+                    exporter.close()
+                profile.add('export finish', time.perf_counter() - start)
+            except Exception as e:
+                feedback.reportError(f'✗ 3D export error: {str(e)}')
+                self._abort_exports(exporters, None)
+                exporters = []
+        if meshes in exporters:
+            for writer in meshes.stl.values():
+                feedback.pushInfo(f'✓ STL: {writer.path} ({writer.count} triangles)')
+            if meshes.gltf is not None:
+                feedback.pushInfo(f'✓ glTF: {meshes.gltf.path} ({meshes.gltf.count} conduits)')
+        if dxf in exporters:
             feedback.pushInfo('=' * 50)
+            feedback.pushInfo(f'✓ DXF: {dxf.path}')
+            feedback.pushInfo(f'  Circular: {dxf.circular_count}')
+            feedback.pushInfo(f'  Rectangular: {dxf.rectangular_count}')
+            feedback.pushInfo('Civil 3D: ConvertToSurface → Thicken')
+            feedback.pushInfo('=' * 50)
+
+        if incremental is not None:
+            incremental.close(feedback.isCanceled())
+            feedback.pushInfo(f'Incremental: {incremental.added} added, {incremental.changed} changed, '
+                              f'{incremental.deleted} deleted, {incremental.unchanged} unchanged')
+
+        if cache is not None:
+            feedback.pushInfo(f'Buffer cache: {cache.hits} hits, {cache.misses} misses')
+            cache.close()
+
+        profile.stop()
+        for line in profile.summary():
+            feedback.pushInfo(line)
+        if profile_path:
+            profile.write(profile_path)
 
         return {
             self.OUTPUT_CONDUITS: dest_id_conduits,
             self.OUTPUT_WALLS: dest_id_walls,
             self.OUTPUT_EXCAVATION: dest_id_excavation,
-            self.OUTPUT_TOTAL: dest_id_total
+            self.OUTPUT_TOTAL: dest_id_total,
+            self.OUTPUT_FOOTPRINT: dest_id_footprint,
+            self.OUTPUT_CLASHES: dest_id_clashes,
+            self.INCREMENTAL_GPKG: incremental_path or None,
+            self.OUTPUT_GPKG: gpkg_path or None,
+            self.TILE_FOLDER: tile_folder or None,
+            self.OUTPUT_PROFILE: profile_path or None
         }
 
-    # ── DXF export ────────────────────────────────────────────────────
-
-    def _write_3dface(self, f, layer, pts, color):
-        """Escribe una entidad 3DFACE. pts = 3 o 4 tuplas (x,y,z).
-        Si son 3 puntos el 4to se repite como el 3ro (triángulo)."""
-        if len(pts) == 3:
-            pts = [pts[0], pts[1], pts[2], pts[2]]
-        f.write("  0\n3DFACE\n")
-        f.write(f"  8\n{layer}\n")
-        f.write(f" 62\n{color}\n")
-        for code, idx in [(10,0),(11,1),(12,2),(13,3)]:
-            f.write(f" {code}\n{pts[idx][0]:.6f}\n")
-            f.write(f" {code+10}\n{pts[idx][1]:.6f}\n")
-            f.write(f" {code+20}\n{pts[idx][2]:.6f}\n")
-        f.write(" 70\n0\n")
-
-    def _export_3dface_dxf(self, conduits, output_path, feedback):
-        """Export conduits as 3DFACE — DXF R12 nativo, sin dependencias."""
-
-        circular_count = 0
-        rectangular_count = 0
-
-        with open(output_path, 'w') as f:
-            # Header R12
-            f.write("  0\nSECTION\n  2\nHEADER\n")
-            f.write("  9\n$ACADVER\n  1\nAC1009\n")
-            f.write("  0\nENDSEC\n")
-
-            # Layers
-            f.write("  0\nSECTION\n  2\nTABLES\n")
-            f.write("  0\nTABLE\n  2\nLAYER\n 70\n2\n")
-            f.write("  0\nLAYER\n  2\nCONDUITS_CIRCULAR\n 70\n0\n 62\n1\n  6\nCONTINUOUS\n")
-            f.write("  0\nLAYER\n  2\nCONDUITS_RECTANGULAR\n 70\n0\n 62\n3\n  6\nCONTINUOUS\n")
-            f.write("  0\nENDTAB\n")
-            f.write("  0\nENDSEC\n")
-
-            # Entities
-            f.write("  0\nSECTION\n  2\nENTITIES\n")
-
-            for conduit in conduits:
-                width_m = conduit['width_mm'] / 1000.0
-                height_m = conduit['height_mm'] / 1000.0
-                us_invert = conduit['us_invert']
-                ds_invert = conduit['ds_invert']
-                coords = conduit['coords']
-                is_circular = conduit['tipo'] == 'Circular'
-                layer = 'CONDUITS_CIRCULAR' if is_circular else 'CONDUITS_RECTANGULAR'
-                color = 1 if is_circular else 3
-
-                # Distancias acumuladas para interpolación Z
-                total_length_2d = 0
-                cumulative_dist = [0]
-                for i in range(len(coords) - 1):
-                    d = math.sqrt((coords[i+1].x()-coords[i].x())**2 + (coords[i+1].y()-coords[i].y())**2)
-                    total_length_2d += d
-                    cumulative_dist.append(cumulative_dist[-1] + d)
-
-                for i in range(len(coords) - 1):
-                    x1, y1 = coords[i].x(), coords[i].y()
-                    x2, y2 = coords[i+1].x(), coords[i+1].y()
-
-                    ratio_s = cumulative_dist[i] / total_length_2d if total_length_2d > 0 else 0
-                    ratio_e = cumulative_dist[i+1] / total_length_2d if total_length_2d > 0 else 0
-                    z1 = us_invert + (ds_invert - us_invert) * ratio_s
-                    z2 = us_invert + (ds_invert - us_invert) * ratio_e
-
-                    dx, dy = x2 - x1, y2 - y1
-                    seg_len = math.sqrt(dx**2 + dy**2)
-                    if seg_len == 0:
-                        continue
-                    perp_x, perp_y = -dy / seg_len, dx / seg_len
-
-                    if is_circular:
-                        radius = width_m / 2
-                        n = 16
-                        s_pts, e_pts = [], []
-                        for j in range(n):
-                            a = 2 * math.pi * j / n
-                            ca, sa = math.cos(a), math.sin(a)
-                            s_pts.append((x1 + radius*perp_x*ca, y1 + radius*perp_y*ca, z1 + radius*sa))
-                            e_pts.append((x2 + radius*perp_x*ca, y2 + radius*perp_y*ca, z2 + radius*sa))
-
-                        # Laterales
-                        for j in range(n):
-                            jn = (j+1) % n
-                            self._write_3dface(f, layer, [s_pts[j], s_pts[jn], e_pts[jn], e_pts[j]], color)
-                        # Tapas (fan triangulation)
-                        for j in range(1, n-1):
-                            self._write_3dface(f, layer, [s_pts[0], s_pts[j], s_pts[j+1]], color)
-                        for j in range(1, n-1):
-                            self._write_3dface(f, layer, [e_pts[0], e_pts[j+1], e_pts[j]], color)
-                        circular_count += 1
-
-                    else:
-                        hw, hh = width_m / 2, height_m / 2
-                        v = [
-                            (x1+perp_x*hw, y1+perp_y*hw, z1-hh),  # 0
-                            (x1-perp_x*hw, y1-perp_y*hw, z1-hh),  # 1
-                            (x1-perp_x*hw, y1-perp_y*hw, z1+hh),  # 2
-                            (x1+perp_x*hw, y1+perp_y*hw, z1+hh),  # 3
-                            (x2+perp_x*hw, y2+perp_y*hw, z2-hh),  # 4
-                            (x2-perp_x*hw, y2-perp_y*hw, z2-hh),  # 5
-                            (x2-perp_x*hw, y2-perp_y*hw, z2+hh),  # 6
-                            (x2+perp_x*hw, y2+perp_y*hw, z2+hh),  # 7
-                        ]
-                        # 6 caras, cada una dividida en 2 triángulos
-                        for t1, t2 in [
-                            ([v[0],v[1],v[2]], [v[0],v[2],v[3]]),  # Start
-                            ([v[4],v[6],v[5]], [v[4],v[7],v[6]]),  # End
-                            ([v[0],v[4],v[5]], [v[0],v[5],v[1]]),  # Bottom
-                            ([v[3],v[2],v[6]], [v[3],v[6],v[7]]),  # Top
-                            ([v[0],v[3],v[7]], [v[0],v[7],v[4]]),  # Right
-                            ([v[1],v[5],v[6]], [v[1],v[6],v[2]]),  # Left
-                        ]:
-                            self._write_3dface(f, layer, t1, color)
-                            self._write_3dface(f, layer, t2, color)
-                        rectangular_count += 1
-
-            f.write("  0\nENDSEC\n")
-            f.write("  0\nEOF\n")
-
-        feedback.pushInfo(f'  Circular: {circular_count}')
-        feedback.pushInfo(f'  Rectangular: {rectangular_count}')
+    def _ring_features(self, record, rings, wall_thickness, excavation_width, trench=()):
+        """Build the output features of a record, keyed by output parameter.
+
+        ``trench`` holds the DEM attributes of the excavation (minimum and
+        mean cover, volume) when a DEM is used.
+        """
+        conduit_id = record['id']
+        features = {}
+
+        # 1. Conduit buffer
+        cf = QgsFeature()
+        cf.setGeometry(rings.conduit)
+        cf.setAttributes([conduit_id, record['tipo'], record['ancho_mm'],
+                          record['alto_mm'], record['diam_mm'], record['geom'].length()])
+        features[self.OUTPUT_CONDUITS] = cf
+
+        # 2. Walls
+        if not rings.wall.isEmpty():
+            wf = QgsFeature()
+            wf.setGeometry(rings.wall)
+            wf.setAttributes([conduit_id, wall_thickness])
+            features[self.OUTPUT_WALLS] = wf
+
+        # 3. Excavation
+        if not rings.excavation.isEmpty():
+            ef = QgsFeature()
+            ef.setGeometry(rings.excavation)
+            ef.setAttributes([conduit_id, excavation_width] + list(trench))
+            features[self.OUTPUT_EXCAVATION] = ef
+
+        # 4. Total width (outer ring of the excavation)
+        total_width = record['radius_m'] + excavation_width
+        if not rings.total.isEmpty():
+            tf = QgsFeature()
+            tf.setGeometry(rings.total)
+            tf.setAttributes([conduit_id, total_width * 2])
+            features[self.OUTPUT_TOTAL] = tf
+
+        return features
+
+    def _cache_path(self):
+        """Location of the persistent buffer cache in the QGIS user profile."""
+        return os.path.join(QgsApplication.qgisSettingsDirPath(), 'conduit_buffer', 'buffer_cache.sqlite')
+
+    def _write_clashes(self, record, polygon, half_width, clashes, sink):
+        """Check the excavation zone of a record against the previous ones."""
+        for other_id, overlap in clashes.add(record['id'], polygon, end_nodes(record['geom']), half_width):
+            overlap.convertToMultiType()
+            feature = QgsFeature()
+            feature.setGeometry(overlap)
+            feature.setAttributes([other_id, record['id'], overlap.area()])
+            sink.addFeature(feature, QgsFeatureSink.FastInsert)
+
+    def _write_footprint(self, footprint, sink, feedback):
+        """Dissolve the total-width polygons and write one feature per cluster."""
+        feedback.pushInfo(f'Dissolving {len(footprint.geometries)} total width polygons...')
+        area = 0.0
+        for cluster, (count, geometry) in enumerate(footprint.dissolve(feedback), 1):
+            geometry.convertToMultiType()
+            feature = QgsFeature()
+            feature.setGeometry(geometry)
+            feature.setAttributes([cluster, count, geometry.area()])
+            sink.addFeature(feature, QgsFeatureSink.FastInsert)
+            area += geometry.area()
+        feedback.pushInfo(f'Footprint area: {area:.2f} m² '
+                          f'(sum of buffers: {footprint.buffer_area:.2f} m²)')
+
+    def _open_gpkg(self, path, crs_wkt, layer_fields):
+        """Create the output GeoPackage ``path`` and start its load transaction."""
+        if os.path.exists(path):
+            os.remove(path)
+        gpkg = GeoPackageLayers(path, crs_wkt)
+        for name, fields in layer_fields.items():
+            gpkg.add_layer(name, fields)
+        gpkg.begin()
+        return gpkg
+
+    def _close_gpkg(self, gpkg):
+        """Commit the load and build the spatial indexes afterwards."""
+        gpkg.commit()
+        gpkg.create_spatial_indexes(gpkg.created)
+        gpkg.close()
+
+    def _tile_records(self, source, width_field, dimension_unit, tile_size, chain_runs, feedback):
+        """Yield the records of each tile of a grid over the source extent in turn.
+
+        Each conduit is read in the tile that holds its centroid, so the
+        merged outputs have no duplicates. Only one tile is held in memory
+        when chaining, and runs are not chained across tile edges.
+        """
+        extent = source.sourceExtent()
+        tiles = tile_grid(extent.xMinimum(), extent.yMinimum(),
+                          extent.xMaximum(), extent.yMaximum(), tile_size)
+        feedback.pushInfo(f'Tiles: {len(tiles)}')
+        start = 0
+        for tile in tiles:
+            if feedback.isCanceled():
+                return
+            reader = ConduitReader(source, width_field, tile)
+            records = self._conduit_records(reader, dimension_unit, feedback, start)
+            if chain_runs:
+                records = self._chain_records(list(records), feedback)
+            yield from records
+            start += reader.count
+
+    def _conduit_records(self, reader, dimension_unit, feedback, start=0):
+        """Yield one dict per valid conduit with its section and buffer radius.
+
+        Attributes are read in columnar batches from the ConduitReader;
+        sections and radii are computed per batch. Records are numbered
+        from ``start``.
+        """
+        conversion_factor = 0.001 if dimension_unit == 0 else 1.0
+        to_mm = 1.0 if dimension_unit == 0 else 1000.0
+
+        for batch in reader.batches(feedback, start):
+            width_mm = batch.width * to_mm
+            # condheight: solo para clasificar y para DXF
+            condheight_mm = batch.height * to_mm
+            circular, height_mm = classify_sections(width_mm, condheight_mm)
+            radius_m = width_mm * conversion_factor / 2.0
+
+            columns = zip(batch.index.tolist(), batch.ids, width_mm.tolist(), condheight_mm.tolist(),
+                          height_mm.tolist(), circular.tolist(), radius_m.tolist(),
+                          batch.us_invert.tolist(), batch.ds_invert.tolist(), batch.geometries)
+            for current, conduit_id, width, condheight, height, is_circular, radius, us, ds, geom in columns:
+                if math.isnan(width):
+                    feedback.reportError(f'Feature {conduit_id}: null width, skipping...')
+                    continue
+                condheight = None if math.isnan(condheight) else condheight
+
+                yield {
+                    'index': current,
+                    'id': conduit_id,
+                    'tipo': CIRCULAR if is_circular else RECTANGULAR,
+                    'ancho_mm': None if is_circular else width,
+                    'alto_mm': None if is_circular else condheight,
+                    'diam_mm': width if is_circular else None,
+                    'width_mm': width,
+                    'height_mm': height,
+                    'radius_m': radius,
+                    'us_invert': None if math.isnan(us) else us,
+                    'ds_invert': None if math.isnan(ds) else ds,
+                    'geom': geom,
+                    'tile': reader.tile
+                }
+
+    def _chain_records(self, records, feedback):
+        """Merge records that continue each other into one record per pipe run.
+
+        Merged runs get the id ``first..last``, the inverts of their end
+        conduits and per-vertex invert levels in ``z`` so the DXF profile
+        follows every member conduit.
+        """
+        for record in records:
+            geom = record['geom']
+            # Las geometrías nulas o vacías no se encadenan
+            if geom.isEmpty():
+                parts = []
+            else:
+                parts = geom.asMultiPolyline() if geom.isMultipart() else [geom.asPolyline()]
+            chainable = (len(parts) == 1 and record['us_invert'] is not None
+                         and record['ds_invert'] is not None)
+            record['xy'] = [(p.x(), p.y()) for p in parts[0]] if chainable else None
+            record['section'] = (record['tipo'], record['width_mm'], record['height_mm'])
+
+        chains = chain_conduits(records)
+        feedback.pushInfo(f'Chained {len(records)} conduits into {len(chains)} runs')
+
+        processed = records[0]['index'] if records else 0
+        for chain in chains:
+            members = [records[i] for i in chain]
+            processed += len(members)
+            if len(members) == 1:
+                record = members[0]
+                record['index'] = processed - 1
+                yield record
+                continue
+
+            xy, z = [], []
+            for member in members:
+                levels = invert_levels(np.array(member['xy']), member['us_invert'], member['ds_invert'])
+                skip = 1 if xy else 0
+                xy += member['xy'][skip:]
+                z += levels.tolist()[skip:]
+
+            record = dict(members[0])
+            record.update({
+                'index': processed - 1,
+                'id': f"{members[0]['id']}..{members[-1]['id']}",
+                'ds_invert': members[-1]['ds_invert'],
+                'geom': QgsGeometry.fromPolylineXY([QgsPointXY(x, y) for x, y in xy]),
+                'z': np.array(z)
+            })
+            yield record
+
+    # ── 3D export ─────────────────────────────────────────────────────
+
+    def _abort_exports(self, exporters, export_queue):
+        """Stop the background writer, if any, and leave the 3D files incomplete."""
+        if export_queue is not None:
+            try:
+                export_queue.close()
+            except Exception:
+                pass
+        for exporter in exporters:
+            exporter.abort()
+
+    def _conduit_profile(self, record):
+        """Section and (xy, z) arrays of every part of a record.
+
+        Lightweight input of the DXF export and the DEM sampling. NULL
+        inverts are taken as 0, like missing invert fields; NULL or empty
+        geometries give no parts.
+        """
+        geom = record['geom']
+        if geom.isEmpty():
+            lines = []
+        else:
+            lines = geom.asMultiPolyline() if geom.isMultipart() else [geom.asPolyline()]
+        parts = [np.array([(p.x(), p.y()) for p in line]).reshape(-1, 2) for line in lines]
+        if record.get('z') is not None and len(parts) == 1:
+            levels = [record['z']]
+        else:
+            levels = part_levels(parts, record['us_invert'] or 0.0, record['ds_invert'] or 0.0)
+        return {
+            'id': record['id'],
+            'tipo': record['tipo'],
+            'width_mm': record['width_mm'],
+            'height_mm': record['height_mm'],
+            'parts': list(zip(parts, levels)),
+            'fingerprint': record.get('fingerprint')
+        }
@@ -0,0 +1,185 @@
+"""
+Headless batch runner
+Runs the algorithm over many network exports on a pool of worker processes,
+each starting QGIS once
+
+Usage: python -m conduit_buffer_plugin.conduit_buffer_batch OUTPUT_FOLDER INPUT [INPUT ...]
+       [--processes N] [--incremental] [--param NAME=VALUE ...]
+
+Run from the folder that contains conduit_buffer_plugin, with a Python that
+can import qgis.core. Each input gets a folder named after it (suffixed
+when two inputs share a name) with outputs.gpkg (the four layers), the
+DXF when EXPORT_DXF is set, the STL/glTF files when MESH_FORMATS is set
+and profile.json; batch_summary.json lists every file. With --incremental
+the four layers go to incremental.gpkg instead, which later runs over the
+same output folder only update for the conduits that changed.
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+import traceback
+
+from qgis.core import QgsApplication, QgsProcessingContext, QgsProcessingFeedback
+
+from .conduit_buffer_algorithm import ConduitBufferAlgorithm
+
+
+DEFAULT_PARAMETERS = {
+    'WIDTH_FIELD': 'condwidth',
+    'DIMENSION_UNIT': 0,
+    'WALL_THICKNESS': 0.15,
+    'EXCAVATION_WIDTH': 0.5,
+    'EXPORT_DXF': False,
+}
+
+# Rutas que el lote asigna a cada archivo; no se aceptan con --param
+PER_FILE_PARAMETERS = ('INPUT', 'DXF_FOLDER', 'OUTPUT_GPKG', 'OUTPUT_PROFILE', 'INCREMENTAL_GPKG')
+
+# QgsApplication del proceso de trabajo, creada una sola vez
+_app = None
+
+
+class _RunFeedback(QgsProcessingFeedback):
+    """Feedback that keeps every error reported during a run."""
+
+    def __init__(self):
+        super().__init__()
+        self.errors = []
+
+    def reportError(self, error, fatalError=False):
+        self.errors.append(error)
+        super().reportError(error, fatalError)
+
+
+def _init_worker():
+    global _app
+    _app = QgsApplication([], False)
+    _app.initQgis()
+
+
+def run_file(task):
+    """Process one input file in the current worker; returns its summary entry.
+
+    Errors reported by the algorithm are listed in ``errors``; a failed or
+    crashed file also gets the reason in ``error``.
+    """
+    input_path, folder, parameters, incremental = task
+    os.makedirs(folder, exist_ok=True)
+
+    parameters = dict(DEFAULT_PARAMETERS, **parameters)
+    parameters.update({
+        'INPUT': input_path,
+        'DXF_FOLDER': folder,
+        'OUTPUT_PROFILE': os.path.join(folder, 'profile.json'),
+    })
+    # El GeoPackage incremental ya guarda las cuatro capas y no admite el único
+    if incremental:
+        parameters['INCREMENTAL_GPKG'] = os.path.join(folder, 'incremental.gpkg')
+    else:
+        parameters['OUTPUT_GPKG'] = os.path.join(folder, 'outputs.gpkg')
+    # Las cuatro capas van al GeoPackage; las salidas sueltas se omiten
+    for output in ('OUTPUT_CONDUITS', 'OUTPUT_WALLS', 'OUTPUT_EXCAVATION', 'OUTPUT_TOTAL'):
+        parameters.setdefault(output, None)
+
+    entry = {'input': input_path, 'output_folder': folder, 'pid': os.getpid()}
+    start = time.perf_counter()
+    feedback = _RunFeedback()
+    try:
+        algorithm = ConduitBufferAlgorithm().create()
+        # run() atrapa las excepciones y solo las informa al feedback
+        _, ok = algorithm.run(parameters, QgsProcessingContext(), feedback)
+        entry['status'] = 'ok' if ok else 'failed'
+        if not ok:
+            entry['error'] = feedback.errors[-1] if feedback.errors else 'the algorithm returned no result'
+    except Exception:
+        entry['status'] = 'error'
+        entry['error'] = traceback.format_exc()
+    if feedback.errors:
+        entry['errors'] = feedback.errors
+    entry['seconds'] = time.perf_counter() - start
+    return entry
+
+
+def run_batch(inputs, output_folder, parameters=None, processes=None, incremental=False, report=print):
+    """Run every input on a pool of ``processes`` workers and write batch_summary.json.
+
+    Files are handed out one at a time, so long and short exports balance
+    across the workers. With ``incremental`` each file writes
+    ``incremental.gpkg`` instead of ``outputs.gpkg``. Raises ValueError,
+    before any file runs, for parameters the batch sets per file or that
+    the incremental GeoPackage cannot be combined with. Returns the
+    summary entries in input order.
+    """
+    parameters = parameters or {}
+    fixed = [name for name in PER_FILE_PARAMETERS if name in parameters]
+    if fixed:
+        raise ValueError(f"{', '.join(fixed)}: the batch sets these paths in the output folder "
+                         f"of each file (use --incremental for incremental.gpkg)")
+    if incremental and parameters.get('TILE_FOLDER'):
+        raise ValueError('TILE_FOLDER cannot be combined with --incremental: the per-tile '
+                         'GeoPackages are recreated on every run')
+    os.makedirs(output_folder, exist_ok=True)
+    processes = min(processes or os.cpu_count() or 1, len(inputs)) or 1
+    tasks, names = [], set()
+    for path in inputs:
+        name = base = os.path.splitext(os.path.basename(path))[0]
+        suffix = 1
+        while name in names:
+            suffix += 1
+            name = f'{base}_{suffix}'
+        names.add(name)
+        tasks.append((os.path.abspath(path), os.path.join(output_folder, name), parameters, incremental))
+    start = time.perf_counter()
+    entries = {}
+    with multiprocessing.Pool(processes, initializer=_init_worker) as pool:
+        for entry in pool.imap_unordered(run_file, tasks):
+            entries[entry['output_folder']] = entry
+            report(f"[{len(entries)}/{len(tasks)}] {entry['status']:<6} {entry['seconds']:8.1f} s  "
+                   f"{entry['input']}")
+            if 'error' in entry:
+                report(f"    {entry['error'].strip().splitlines()[-1]}")
+    summary = [entries[task[1]] for task in tasks]
+    elapsed = time.perf_counter() - start
+    with open(os.path.join(output_folder, 'batch_summary.json'), 'w', encoding='utf-8') as f:
+        json.dump({'processes': processes, 'elapsed_s': elapsed, 'parameters': parameters,
+                   'incremental': incremental, 'files': summary}, f, indent=2)
+    failed = sum(1 for entry in summary if entry['status'] != 'ok')
+    report(f'{len(summary)} files in {elapsed:.1f} s with {processes} processes, {failed} failed')
+    return summary
+
+
+def _parameter(text):
+    name, _, value = text.partition('=')
+    try:
+        return name, json.loads(value)
+    except ValueError:
+        return name, value
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the Variable Width Buffer algorithm on many files')
+    parser.add_argument('output_folder')
+    parser.add_argument('inputs', nargs='+')
+    parser.add_argument('--processes', type=int, default=None,
+                        help='worker processes (default: one per core)')
+    parser.add_argument('--incremental', action='store_true',
+                        help='write incremental.gpkg in each output folder instead of outputs.gpkg, '
+                             'so reruns only update the conduits that changed')
+    parser.add_argument('--param', action='append', default=[], type=_parameter, metavar='NAME=VALUE',
+                        help='algorithm parameter, value parsed as JSON when possible')
+    args = parser.parse_args()
+
+    try:
+        summary = run_batch(args.inputs, args.output_folder, dict(args.param), args.processes,
+                            args.incremental)
+    except ValueError as e:
+        parser.error(str(e))
+    sys.exit(0 if all(entry['status'] == 'ok' for entry in summary) else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+"""
+Persistent buffer cache
+SQLite store of buffered geometries reused between runs
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+
+
+DEFAULT_MAX_BYTES = 1 << 30
+# Escrituras por transacción: otras corridas esperan como mucho un lote
+COMMIT_EVERY = 256
+# Segundos de espera ante una base bloqueada por otro proceso
+BUSY_TIMEOUT = 2.0
+
+
+class BufferCache:
+    """Size-bounded LRU cache of WKB geometries on disk.
+
+    Entries are keyed by a hash of the input WKB and the parameters that
+    produced them (operation, radii, segmentation), so changing the wall
+    or excavation width does not invalidate the conduit buffers. Least
+    recently used entries are evicted on close until the cache fits in
+    ``max_bytes``. Safe to share between worker threads.
+
+    Writes are committed every ``commit_every`` entries, so several runs
+    (other QGIS instances, batch workers) can share the file. When the
+    database stays locked for ``timeout`` seconds, a read counts as a
+    miss and a write is dropped; the cache never fails a run.
+    """
+
+    def __init__(self, path, max_bytes=DEFAULT_MAX_BYTES, commit_every=COMMIT_EVERY,
+                 timeout=BUSY_TIMEOUT):
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        self.path = path
+        self.max_bytes = max_bytes
+        self.commit_every = commit_every
+        self.hits = 0
+        self.misses = 0
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=timeout, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute('CREATE TABLE IF NOT EXISTS buffers ('
+                           'key BLOB PRIMARY KEY, wkb BLOB NOT NULL, '
+                           'size INTEGER NOT NULL, used INTEGER NOT NULL)')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS buffers_used ON buffers (used)')
+        self._clock = self._conn.execute('SELECT COALESCE(MAX(used), 0) FROM buffers').fetchone()[0]
+
+    @staticmethod
+    def key(wkb, *params):
+        """Return the cache key of ``wkb`` processed with ``params``."""
+        digest = hashlib.blake2b(wkb, digest_size=20)
+        digest.update(repr(params).encode())
+        return digest.digest()
+
+    def get(self, key):
+        """Return the cached WKB for ``key`` or None."""
+        with self._lock:
+            try:
+                row = self._conn.execute('SELECT wkb FROM buffers WHERE key = ?', (key,)).fetchone()
+            except sqlite3.OperationalError:
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._clock += 1
+            self._write('UPDATE buffers SET used = ? WHERE key = ?', (self._clock, key))
+            return bytes(row[0])
+
+    def put(self, key, wkb):
+        with self._lock:
+            self._clock += 1
+            self._write('INSERT OR REPLACE INTO buffers (key, wkb, size, used) VALUES (?, ?, ?, ?)',
+                        (key, wkb, len(wkb), self._clock))
+
+    def _write(self, sql, params):
+        # Con la base bloqueada la escritura se descarta: solo se pierde una entrada
+        try:
+            self._conn.execute(sql, params)
+            self._pending += 1
+            if self._pending >= self.commit_every:
+                self._conn.commit()
+                self._pending = 0
+        except sqlite3.OperationalError:
+            pass
+
+    def close(self):
+        """Commit, evict least recently used entries over ``max_bytes`` and close."""
+        with self._lock:
+            try:
+                total = self._conn.execute('SELECT COALESCE(SUM(size), 0) FROM buffers').fetchone()[0]
+                if total > self.max_bytes:
+                    evict = []
+                    for key, size in self._conn.execute('SELECT key, size FROM buffers ORDER BY used'):
+                        if total <= self.max_bytes:
+                            break
+                        evict.append((key,))
+                        total -= size
+                    self._conn.executemany('DELETE FROM buffers WHERE key = ?', evict)
+                self._conn.commit()
+            except sqlite3.OperationalError:
+                self._conn.rollback()
+            self._conn.close()
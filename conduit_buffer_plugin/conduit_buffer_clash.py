@@ -0,0 +1,95 @@
+"""
+Clash detection
+Reports overlaps between the excavation zones of neighbouring conduits
+"""
+
+import math
+
+from qgis.core import QgsGeometry, QgsPointXY, QgsSpatialIndex, QgsWkbTypes
+
+from .conduit_buffer_network import node_key
+
+
+# Superficie mínima (m²) de un solape para reportarlo
+MIN_OVERLAP_AREA = 0.001
+# Segmentos por cuarto de círculo del disco que se descuenta en cada nodo común
+JUNCTION_SEGMENTS = 8
+# Radio del disco / semiancho mayor: dos zanjas a 90° se solapan hasta r·√2 del nodo
+JUNCTION_FACTOR = math.sqrt(2)
+
+
+def end_nodes(geom):
+    """End points of every part of a line geometry, keyed by node key.
+
+    NULL and empty geometries have no end nodes.
+    """
+    if geom.isEmpty():
+        return {}
+    lines = geom.asMultiPolyline() if geom.isMultipart() else [geom.asPolyline()]
+    return {node_key((p.x(), p.y())): (p.x(), p.y())
+            for line in lines if line for p in (line[0], line[-1])}
+
+
+def junction_disk(point, half_width):
+    """Polygon that covers the junction overlap of trenches of ``half_width``.
+
+    The disk has JUNCTION_FACTOR times ``half_width`` as radius. This holds
+    the whole overlap of two trenches that leave the node at 90° or more.
+    The polygon is circumscribed about the circle, so its chords never
+    leave slivers of the buffer arcs.
+    """
+    radius = JUNCTION_FACTOR * half_width / math.cos(math.pi / (4 * JUNCTION_SEGMENTS))
+    return QgsGeometry.fromPointXY(QgsPointXY(*point)).buffer(radius, JUNCTION_SEGMENTS)
+
+
+class ClashDetector:
+    """Incremental overlap search over excavation polygons.
+
+    Every polygon passed to add() is checked against the ones already
+    indexed whose bounding boxes intersect it, through a prepared
+    geometry, and then added to the QgsSpatialIndex. Each pair is
+    therefore tested once, and only when the boxes meet. Conduits sharing
+    an end node overlap by construction at the junction, so a disk sized
+    from the larger half-width around each shared node is removed from
+    their overlap first (see junction_disk). Twin barrels between the same
+    manholes and pipes side by side into a chamber are still reported
+    along their length.
+    """
+
+    def __init__(self, min_area=MIN_OVERLAP_AREA):
+        self.min_area = min_area
+        self.index = QgsSpatialIndex()
+        self.items = []
+        self.count = 0
+
+    def add(self, conduit_id, polygon, nodes, half_width=0.0):
+        """Index ``polygon`` and return (other id, overlap polygon) for each clash.
+
+        ``nodes`` maps the node keys of the conduit ends to their points
+        (see end_nodes) and ``half_width`` is half the width of
+        ``polygon``.
+        """
+        if polygon.isEmpty():
+            return []
+        bbox = polygon.boundingBox()
+        clashes = []
+        candidates = self.index.intersects(bbox)
+        if candidates:
+            engine = QgsGeometry.createGeometryEngine(polygon.constGet())
+            engine.prepareGeometry()
+            for j in candidates:
+                other_id, other, other_nodes, other_half_width = self.items[j]
+                if not engine.intersects(other.constGet()):
+                    continue
+                overlap = polygon.intersection(other).convertToType(QgsWkbTypes.PolygonGeometry, True)
+                for key in nodes.keys() & other_nodes.keys():
+                    if overlap is None or overlap.isEmpty():
+                        break
+                    overlap = overlap.difference(junction_disk(nodes[key], max(half_width, other_half_width)))
+                if overlap is None or overlap.isEmpty() or overlap.area() < self.min_area:
+                    continue
+                clashes.append((other_id, overlap))
+        self.index.addFeature(len(self.items), bbox)
+        self.items.append((conduit_id, polygon, nodes, half_width))
+        self.count += len(clashes)
+        return clashes
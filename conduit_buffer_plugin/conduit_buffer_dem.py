@@ -0,0 +1,159 @@
+"""
+DEM sampling
+Ground levels, cover depth and trench volume of conduits from a raster DEM
+"""
+
+from collections import OrderedDict
+
+import numpy as np
+from qgis.core import Qgis, QgsCoordinateTransform, QgsLineString, QgsPointXY, QgsRectangle
+
+
+# Píxeles por lado de cada bloque leído del proveedor
+BLOCK_SIZE = 256
+# Bloques retenidos en memoria (64 x 256² x 8 bytes = 32 MB)
+CACHE_BLOCKS = 64
+
+_DTYPES = {
+    Qgis.Byte: np.uint8,
+    Qgis.UInt16: np.uint16,
+    Qgis.Int16: np.int16,
+    Qgis.UInt32: np.uint32,
+    Qgis.Int32: np.int32,
+    Qgis.Float32: np.float32,
+    Qgis.Float64: np.float64,
+}
+
+
+class DemSampler:
+    """Nearest-pixel sampling of one raster band through a block cache.
+
+    The raster is read with ``provider.block`` in tiles of ``block_size``
+    pixels that are kept as NumPy arrays (NoData as NaN) in an LRU cache,
+    so neighbouring conduits reuse the same blocks and points are sampled
+    with array indexing instead of one identify() call each. Points are
+    given in ``crs`` and reprojected to the raster CRS with
+    ``transform_context`` when they differ, all points of a call at once.
+    ``step`` is the pixel size in raster units; source_step() gives it in
+    ``crs`` units at a location.
+    Not thread-safe.
+    """
+
+    def __init__(self, layer, crs=None, transform_context=None, band=1,
+                 block_size=BLOCK_SIZE, cache_blocks=CACHE_BLOCKS):
+        self.provider = layer.dataProvider()
+        self.band = band
+        self.block_size = block_size
+        self.cache_blocks = cache_blocks
+        extent = self.provider.extent()
+        self.xmin, self.ymax = extent.xMinimum(), extent.yMaximum()
+        self.columns, self.rows = self.provider.xSize(), self.provider.ySize()
+        self.xres = extent.width() / self.columns
+        self.yres = extent.height() / self.rows
+        self.step = min(self.xres, self.yres)
+        self._block_columns = -(-self.columns // block_size)
+        self._blocks = OrderedDict()
+        self._transform = None
+        if crs is not None and crs.isValid() and crs != layer.crs():
+            self._transform = QgsCoordinateTransform(crs, layer.crs(), transform_context)
+
+    def _block(self, key):
+        block = self._blocks.get(key)
+        if block is not None:
+            self._blocks.move_to_end(key)
+            return block
+        size = self.block_size
+        row0, col0 = divmod(key, self._block_columns)
+        row0, col0 = row0 * size, col0 * size
+        rows, columns = min(size, self.rows - row0), min(size, self.columns - col0)
+        rect = QgsRectangle(self.xmin + col0 * self.xres, self.ymax - (row0 + rows) * self.yres,
+                            self.xmin + (col0 + columns) * self.xres, self.ymax - row0 * self.yres)
+        raster = self.provider.block(self.band, rect, columns, rows)
+        dtype = _DTYPES.get(raster.dataType()) if raster.isValid() else None
+        if dtype is None:
+            block = np.full((rows, columns), np.nan)
+        else:
+            block = np.frombuffer(bytes(raster.data()), dtype=dtype).reshape(rows, columns).astype(float)
+            if raster.hasNoDataValue():
+                block[block == raster.noDataValue()] = np.nan
+        self._blocks[key] = block
+        if len(self._blocks) > self.cache_blocks:
+            self._blocks.popitem(last=False)
+        return block
+
+    def source_step(self, x, y):
+        """Length in ``crs`` units of one pixel at the point (x, y).
+
+        The point is taken to the raster CRS and a pixel-sized step along
+        each axis is taken back; the shorter one is returned. Without
+        reprojection this is ``step``.
+        """
+        if self._transform is None:
+            return self.step
+        reverse = QgsCoordinateTransform.ReverseTransform
+        center = self._transform.transform(QgsPointXY(x, y))
+        steps = []
+        for dx, dy in ((self.step, 0.0), (0.0, self.step)):
+            point = self._transform.transform(QgsPointXY(center.x() + dx, center.y() + dy), reverse)
+            steps.append(np.hypot(point.x() - x, point.y() - y))
+        return min(steps)
+
+    def sample(self, x, y):
+        """Return the raster values at the points (x, y); NaN outside or on NoData."""
+        x, y = np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+        if self._transform is not None and len(x):
+            # Una sola llamada de reproyección para todos los puntos
+            line = QgsLineString(x.tolist(), y.tolist())
+            line.transform(self._transform)
+            x, y = np.array(line.xVector()), np.array(line.yVector())
+        values = np.full(len(x), np.nan)
+        column = np.floor((x - self.xmin) / self.xres).astype(int)
+        row = np.floor((self.ymax - y) / self.yres).astype(int)
+        inside = (column >= 0) & (column < self.columns) & (row >= 0) & (row < self.rows)
+        keys = (row // self.block_size) * self._block_columns + column // self.block_size
+        for key in np.unique(keys[inside]):
+            mask = inside & (keys == key)
+            row0, col0 = divmod(int(key), self._block_columns)
+            values[mask] = self._block(int(key))[row[mask] - row0 * self.block_size,
+                                                 column[mask] - col0 * self.block_size]
+        return values
+
+
+def trench_profile(sampler, parts, crown_height, trench_width):
+    """Cover depth and trench volume of a conduit.
+
+    ``parts`` is a list of (xy, z) arrays with the invert level of each
+    vertex. Ground levels are sampled every raster pixel along each part,
+    with the pixel size converted to layer units at the part's start.
+    Cover is measured from the ground to the crown (invert +
+    ``crown_height``) and the volume is the depth to the invert times
+    ``trench_width``, integrated along the conduit over the stations with
+    ground data. Returns (minimum cover, mean cover, volume) or None when
+    no station falls on the DEM.
+    """
+    covers, volume, sampled = [], 0.0, False
+    for xy, z in parts:
+        if len(xy) < 2:
+            continue
+        distance = np.concatenate(([0.0], np.cumsum(np.hypot(*np.diff(xy, axis=0).T))))
+        if distance[-1] <= 0:
+            continue
+        step = sampler.source_step(xy[0, 0], xy[0, 1])
+        if not step > 0:
+            continue
+        stations = np.append(np.arange(0.0, distance[-1], step), distance[-1])
+        ground = sampler.sample(np.interp(stations, distance, xy[:, 0]),
+                                np.interp(stations, distance, xy[:, 1]))
+        invert = np.interp(stations, distance, z)
+        valid = ~np.isnan(ground)
+        if not valid.any():
+            continue
+        sampled = True
+        covers.append(ground[valid] - invert[valid] - crown_height)
+        depth = np.clip(ground - invert, 0.0, None)
+        both = valid[:-1] & valid[1:]
+        volume += float(np.sum(((depth[:-1] + depth[1:]) / 2.0 * np.diff(stations))[both])) * trench_width
+    if not sampled:
+        return None
+    covers = np.concatenate(covers)
+    return float(covers.min()), float(covers.mean()), volume
@@ -0,0 +1,227 @@
+"""
+DXF R12 writer
+Formats whole batches of entities at once and writes them in large blocks
+"""
+
+import time
+
+import numpy as np
+
+from .conduit_buffer_mesh import CIRCULAR, conduit_meshes
+
+
+DEFAULT_BUFFER_SIZE = 1 << 20
+FACE_BATCH = 4096
+# Los índices de cara en R12 son enteros de 16 bits: máximo 32767 vértices
+POLYFACE_MAX_FACES = 32767 // 4
+
+# (nombre, color) de las capas del DXF
+CONDUIT_LAYERS = [('CONDUITS_CIRCULAR', 1), ('CONDUITS_RECTANGULAR', 3)]
+
+
+def _face_template(layer, color):
+    """Return the %-format template of one 3DFACE with 12 coordinate slots."""
+    template = f"  0\n3DFACE\n  8\n{layer}\n 62\n{color}\n".replace('%', '%%')
+    for code in (10, 11, 12, 13):
+        template += f" {code}\n%.6f\n {code + 10}\n%.6f\n {code + 20}\n%.6f\n"
+    return template + " 70\n0\n"
+
+
+class DxfWriter:
+    """Buffered writer for ASCII DXF R12 files.
+
+    Text is collected in memory and handed to the file in blocks of about
+    ``buffer_size`` characters. Entities are formatted per batch from NumPy
+    arrays with one %-format call, producing the same text as formatting
+    each value with ``{:.6f}``.
+    """
+
+    def __init__(self, path, buffer_size=DEFAULT_BUFFER_SIZE):
+        self.path = path
+        self.buffer_size = buffer_size
+        self._file = open(path, 'w')
+        self._parts = []
+        self._pending = 0
+        self._templates = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self._file.close()
+
+    def write(self, text):
+        self._parts.append(text)
+        self._pending += len(text)
+        if self._pending >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        if self._parts:
+            self._file.write(''.join(self._parts))
+            self._parts = []
+            self._pending = 0
+
+    def begin(self, layers):
+        """Write the R12 header, the layer table and open the ENTITIES section."""
+        self.write("  0\nSECTION\n  2\nHEADER\n")
+        self.write("  9\n$ACADVER\n  1\nAC1009\n")
+        self.write("  0\nENDSEC\n")
+
+        self.write("  0\nSECTION\n  2\nTABLES\n")
+        self.write(f"  0\nTABLE\n  2\nLAYER\n 70\n{len(layers)}\n")
+        for name, color in layers:
+            self.write(f"  0\nLAYER\n  2\n{name}\n 70\n0\n 62\n{color}\n  6\nCONTINUOUS\n")
+        self.write("  0\nENDTAB\n")
+        self.write("  0\nENDSEC\n")
+
+        self.write("  0\nSECTION\n  2\nENTITIES\n")
+
+    def write_3dfaces(self, layer, color, points):
+        """Write one 3DFACE per row of ``points``, a (m, 4, 3) array."""
+        for text in self._3dface_chunks(layer, color, points):
+            self.write(text)
+
+    def format_3dfaces(self, layer, color, points):
+        """Return the text write_3dfaces would write."""
+        return ''.join(self._3dface_chunks(layer, color, points))
+
+    def _3dface_chunks(self, layer, color, points):
+        template = self._templates.get((layer, color))
+        if template is None:
+            template = self._templates[(layer, color)] = _face_template(layer, color)
+        points = np.asarray(points, dtype=float).reshape(-1, 12)
+        for i in range(0, len(points), FACE_BATCH):
+            batch = points[i:i + FACE_BATCH]
+            yield (template * len(batch)) % tuple(batch.ravel().tolist())
+
+    def write_polyface(self, layer, color, vertices, faces):
+        """Write an indexed mesh as one or more POLYFACE MESH entities.
+
+        ``faces`` is a (m, 4) array of indices into ``vertices``; a face whose
+        last two indices are equal is written as a triangle. Vertices are
+        deduplicated at output precision and meshes are split so every
+        entity stays within the R12 limit of 32767 vertices.
+        """
+        for text in self._polyface_chunks(layer, color, vertices, faces):
+            self.write(text)
+
+    def format_polyface(self, layer, color, vertices, faces):
+        """Return the text write_polyface would write."""
+        return ''.join(self._polyface_chunks(layer, color, vertices, faces))
+
+    def _polyface_chunks(self, layer, color, vertices, faces):
+        vertices = np.asarray(vertices, dtype=float).reshape(-1, 3)
+        faces = np.asarray(faces).reshape(-1, 4)
+        lay = layer.replace('%', '%%')
+        for i in range(0, len(faces), POLYFACE_MAX_FACES):
+            batch = faces[i:i + POLYFACE_MAX_FACES]
+            used, local = np.unique(batch, return_inverse=True)
+            unique, inverse = np.unique(np.round(vertices[used], 6), axis=0, return_inverse=True)
+            indices = inverse.reshape(-1)[local.reshape(-1)].reshape(-1, 4) + 1
+
+            yield (f"  0\nPOLYLINE\n  8\n{layer}\n 62\n{color}\n 66\n1\n"
+                   f" 10\n0.0\n 20\n0.0\n 30\n0.0\n 70\n64\n"
+                   f" 71\n{len(unique)}\n 72\n{len(indices)}\n")
+            vertex = f"  0\nVERTEX\n  8\n{lay}\n 10\n%.6f\n 20\n%.6f\n 30\n%.6f\n 70\n192\n"
+            for j in range(0, len(unique), FACE_BATCH):
+                chunk = unique[j:j + FACE_BATCH]
+                yield (vertex * len(chunk)) % tuple(chunk.ravel().tolist())
+
+            record = f"  0\nVERTEX\n  8\n{lay}\n 10\n0.0\n 20\n0.0\n 30\n0.0\n 70\n128\n"
+            quad = record + " 71\n%d\n 72\n%d\n 73\n%d\n 74\n%d\n"
+            triangle = record + " 71\n%d\n 72\n%d\n 73\n%d\n"
+            is_triangle = indices[:, 2] == indices[:, 3]
+            yield ''.join(
+                triangle % tuple(face[:3]) if tri else quad % tuple(face)
+                for face, tri in zip(indices.tolist(), is_triangle.tolist()))
+
+            yield f"  0\nSEQEND\n  8\n{layer}\n"
+
+    def close(self):
+        """Close the ENTITIES section, write EOF and close the file."""
+        self.write("  0\nENDSEC\n")
+        self.write("  0\nEOF\n")
+        self.flush()
+        self._file.close()
+
+    def abort(self):
+        """Close the file without completing it."""
+        self._parts = []
+        self._file.close()
+
+
+class DxfConduitExporter:
+    """Streams conduit solids into a DXF file as conduits are processed.
+
+    The file is opened and its header written on construction; each call
+    to add() meshes one conduit and hands its entities to the buffered
+    writer, so memory does not grow with the network size. ``conduit`` is a
+    dict with ``id``, ``tipo``, ``width_mm``, ``height_mm``, ``parts`` (a
+    list of (xy, z) arrays, one per line part) and optionally
+    ``fingerprint``. With a ``fragments`` BufferCache the text of each
+    conduit is stored by fingerprint and reused instead of meshing again.
+    With a RunProfile the ``dxf mesh`` (faces) and ``dxf write`` stages
+    are timed.
+    """
+
+    def __init__(self, path, polyface=False, tube=False, chord_tolerance=0.0,
+                 fragments=None, buffer_size=DEFAULT_BUFFER_SIZE, profile=None):
+        self.path = path
+        self.profile = profile
+        self.polyface = polyface
+        self.tube = tube
+        self.chord_tolerance = chord_tolerance
+        self.fragments = fragments
+        self.circular_count = 0
+        self.rectangular_count = 0
+        self.writer = DxfWriter(path, buffer_size)
+        self.writer.begin(CONDUIT_LAYERS)
+
+    def add(self, conduit):
+        start = time.perf_counter()
+        is_circular = conduit['tipo'] == CIRCULAR
+        layer, color = CONDUIT_LAYERS[0] if is_circular else CONDUIT_LAYERS[1]
+
+        key = text = None
+        if self.fragments is not None and conduit.get('fingerprint'):
+            key = self.fragments.key(conduit['fingerprint'].encode(),
+                                     self.polyface, self.tube, self.chord_tolerance)
+            text = self.fragments.get(key)
+
+        if text is not None:
+            text = text.decode()
+            count = sum(int(np.count_nonzero(np.any(np.diff(xy, axis=0) != 0, axis=1)))
+                        for xy, _ in conduit['parts'])
+        else:
+            chunks, count, faces = [], 0, 0
+            for mesh in conduit_meshes(conduit, self.tube, self.chord_tolerance):
+                faces += len(mesh.faces)
+                if self.polyface:
+                    chunks.append(self.writer.format_polyface(layer, color, mesh.vertices, mesh.faces))
+                else:
+                    chunks.append(self.writer.format_3dfaces(layer, color, mesh.vertices[mesh.faces]))
+                count += mesh.segments
+            text = ''.join(chunks)
+            if key is not None:
+                self.fragments.put(key, text.encode())
+            if self.profile is not None:
+                self.profile.add('dxf mesh', time.perf_counter() - start, faces)
+        written = time.perf_counter()
+        self.writer.write(text)
+        if self.profile is not None:
+            self.profile.add('dxf write', time.perf_counter() - written, len(text))
+
+        if is_circular:
+            self.circular_count += count
+        else:
+            self.rectangular_count += count
+
+    def close(self):
+        self.writer.close()
+
+    def abort(self):
+        self.writer.abort()
@@ -0,0 +1,273 @@
+"""
+Binary 3D writers
+Streams the conduit meshes into binary STL files and a glTF 2.0 scene
+"""
+
+import itertools
+import json
+import math
+import os
+import shutil
+import time
+
+import numpy as np
+
+from .conduit_buffer_dxf import CONDUIT_LAYERS
+from .conduit_buffer_mesh import CIRCULAR, conduit_meshes, mesh_triangles
+
+
+DEFAULT_BUFFER_SIZE = 1 << 20
+
+# Registro de un triángulo STL binario: normal, 3 vértices y atributo (50 bytes)
+STL_TRIANGLE = np.dtype([('normal', '<f4', (3,)), ('vertices', '<f4', (3, 3)), ('attribute', '<u2')])
+
+# Color RGBA de cada capa (ACI 1 rojo, 3 verde)
+LAYER_COLORS = {1: [1.0, 0.0, 0.0, 1.0], 3: [0.0, 1.0, 0.0, 1.0]}
+
+# Giro de -90° sobre X: de Z arriba (SIG) a Y arriba (glTF)
+Z_UP_ROTATION = [-math.sqrt(0.5), 0.0, 0.0, math.sqrt(0.5)]
+
+# Constantes de glTF 2.0
+GLTF_FLOAT = 5126
+GLTF_UNSIGNED_INT = 5125
+GLTF_ARRAY_BUFFER = 34962
+GLTF_ELEMENT_ARRAY_BUFFER = 34963
+GLTF_TRIANGLES = 4
+
+
+def outward_faces(faces, section):
+    """Faces of a conduit mesh wound with their normals pointing out.
+
+    The caps of circular sections are wound like the sides in the 3DFACE
+    template, so their normals point into the solid; they are the faces
+    that repeat their third vertex and are reversed here. The template
+    itself is kept so the DXF output does not change.
+    """
+    if section != CIRCULAR:
+        return faces
+    faces = np.array(faces)
+    caps = faces[:, 2] == faces[:, 3]
+    faces[caps] = faces[caps][:, [0, 2, 1, 1]]
+    return faces
+
+
+class StlWriter:
+    """Binary STL file written one batch of triangles at a time.
+
+    The 80-byte header and the triangle count are rewritten on close, so
+    nothing but the open file is kept. Coordinates are float32 relative to
+    ``origin``, which is stated in the header.
+    """
+
+    def __init__(self, path, name, buffer_size=DEFAULT_BUFFER_SIZE):
+        self.path = path
+        self.name = name
+        self.origin = None
+        self.count = 0
+        self._file = open(path, 'wb', buffering=buffer_size)
+        self._file.write(bytes(84))
+
+    def add(self, vertices, triangles):
+        """Write the ``triangles`` (n, 3) indexing rows of the relative ``vertices``."""
+        corners = np.asarray(vertices, dtype=float)[triangles]
+        normals = np.cross(corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0])
+        length = np.sqrt((normals ** 2).sum(axis=1))
+        records = np.zeros(len(triangles), dtype=STL_TRIANGLE)
+        records['normal'] = normals / np.where(length > 0, length, 1.0)[:, None]
+        records['vertices'] = corners
+        self._file.write(records.tobytes())
+        self.count += len(records)
+        return records.nbytes
+
+    def close(self):
+        """Write the header and the triangle count and close the file."""
+        origin = ' '.join(f'{v:.3f}' for v in (self.origin if self.origin is not None else (0, 0, 0)))
+        # Un encabezado que empieza con "solid" se confunde con STL ASCII
+        header = f'{self.name} origin {origin}'.encode('ascii', 'replace')[:80]
+        self._file.seek(0)
+        self._file.write(header.ljust(80, b' '))
+        self._file.write(np.uint32(self.count).tobytes())
+        self._file.close()
+
+    def abort(self):
+        """Close the file without completing it."""
+        self._file.close()
+
+
+class GltfWriter:
+    """glTF 2.0 scene with one mesh node per conduit and a binary buffer.
+
+    Positions are streamed to ``<name>.bin`` and indices to a temporary
+    ``<name>.bin.idx`` file that is appended on close, so the buffer holds
+    two contiguous views and only a small index entry per conduit stays in
+    memory. The JSON is written on close. Positions are float32 relative
+    to ``origin``; the root node puts them back in place and turns the
+    Z-up map coordinates into the Y-up axes of glTF.
+    """
+
+    def __init__(self, path, materials, buffer_size=DEFAULT_BUFFER_SIZE):
+        self.path = path
+        self.bin_path = os.path.splitext(path)[0] + '.bin'
+        self.materials = materials
+        self.origin = None
+        self.count = 0
+        self._entries = []
+        self._positions = open(self.bin_path, 'wb', buffering=buffer_size)
+        self._indices = open(self.bin_path + '.idx', 'w+b', buffering=buffer_size)
+        self._vertex_bytes = 0
+        self._index_bytes = 0
+
+    def add(self, name, material, vertices, triangles):
+        """Write one conduit node; ``triangles`` index rows of the relative ``vertices``."""
+        used, local = np.unique(triangles, return_inverse=True)
+        positions = np.ascontiguousarray(np.asarray(vertices, dtype=float)[used], dtype='<f4')
+        indices = local.reshape(-1).astype('<u4')
+        self._entries.append((name, material, self._vertex_bytes, len(positions),
+                              self._index_bytes, len(indices),
+                              positions.min(axis=0).tolist(), positions.max(axis=0).tolist()))
+        self._positions.write(positions.tobytes())
+        self._indices.write(indices.tobytes())
+        self._vertex_bytes += positions.nbytes
+        self._index_bytes += indices.nbytes
+        self.count += 1
+        return positions.nbytes + indices.nbytes
+
+    def close(self):
+        """Append the indices to the buffer and write the glTF JSON."""
+        self._indices.flush()
+        self._indices.seek(0)
+        shutil.copyfileobj(self._indices, self._positions)
+        self._indices.close()
+        os.remove(self.bin_path + '.idx')
+        self._positions.close()
+
+        ox, oy, oz = self.origin if self.origin is not None else (0.0, 0.0, 0.0)
+        root = {'name': 'conduits', 'rotation': Z_UP_ROTATION, 'translation': [ox, oz, -oy]}
+        if self._entries:
+            root['children'] = list(range(1, len(self._entries) + 1))
+
+        with open(self.path, 'w', encoding='utf-8') as f:
+            f.write('{"asset":{"version":"2.0","generator":"Variable Width Buffer"},'
+                    '"scene":0,"scenes":[{"nodes":[0]}],')
+            f.write('"materials":' + json.dumps([
+                {'name': name, 'doubleSided': True,
+                 'pbrMetallicRoughness': {'baseColorFactor': color, 'metallicFactor': 0.0}}
+                for name, color in self.materials]))
+            self._write_array(f, 'nodes', itertools.chain([root], (
+                {'name': entry[0], 'mesh': i, 'extras': {'id': entry[0]}}
+                for i, entry in enumerate(self._entries))))
+            if self._entries:
+                self._write_array(f, 'meshes', (
+                    {'name': entry[0], 'primitives': [{'attributes': {'POSITION': 2 * i}, 'indices': 2 * i + 1,
+                                                       'material': entry[1], 'mode': GLTF_TRIANGLES}]}
+                    for i, entry in enumerate(self._entries)))
+                self._write_array(f, 'accessors', self._accessors())
+                f.write(',"bufferViews":' + json.dumps([
+                    {'buffer': 0, 'byteOffset': 0, 'byteLength': self._vertex_bytes,
+                     'target': GLTF_ARRAY_BUFFER},
+                    {'buffer': 0, 'byteOffset': self._vertex_bytes, 'byteLength': self._index_bytes,
+                     'target': GLTF_ELEMENT_ARRAY_BUFFER}]))
+                f.write(',"buffers":' + json.dumps([
+                    {'uri': os.path.basename(self.bin_path),
+                     'byteLength': self._vertex_bytes + self._index_bytes}]))
+            f.write('}\n')
+
+    def _accessors(self):
+        for _, _, vertex_offset, vertex_count, index_offset, index_count, low, high in self._entries:
+            yield {'bufferView': 0, 'byteOffset': vertex_offset, 'componentType': GLTF_FLOAT,
+                   'count': vertex_count, 'type': 'VEC3', 'min': low, 'max': high}
+            yield {'bufferView': 1, 'byteOffset': index_offset, 'componentType': GLTF_UNSIGNED_INT,
+                   'count': index_count, 'type': 'SCALAR'}
+
+    @staticmethod
+    def _write_array(f, key, items):
+        f.write(f',"{key}":[')
+        for i, item in enumerate(items):
+            f.write((',' if i else '') + json.dumps(item, separators=(',', ':')))
+        f.write(']')
+
+    def abort(self):
+        """Close the files without writing the JSON."""
+        self._indices.close()
+        self._positions.close()
+        if os.path.exists(self.bin_path + '.idx'):
+            os.remove(self.bin_path + '.idx')
+
+
+class MeshConduitExporter:
+    """Streams conduit solids into binary STL and glTF files.
+
+    Takes the same conduit dicts as DxfConduitExporter and meshes them the
+    same way. With ``stl`` each section layer goes to
+    ``<layer>.stl`` in ``folder``; with ``gltf`` every conduit becomes a
+    node of ``<name>.gltf`` named after its id. Coordinates are stored
+    relative to an origin taken from the first conduit, because float32
+    rounds projected coordinates to about a metre. With a RunProfile
+    the ``3d mesh`` (triangles) and ``3d write`` (bytes) stages are timed.
+    """
+
+    def __init__(self, folder, stl=True, gltf=True, tube=False, chord_tolerance=0.0,
+                 name='conduits_3d', profile=None):
+        self.tube = tube
+        self.chord_tolerance = chord_tolerance
+        self.profile = profile
+        self.origin = None
+        self.stl = {}
+        self.gltf = None
+        try:
+            if stl:
+                for layer, _ in CONDUIT_LAYERS:
+                    self.stl[layer] = StlWriter(os.path.join(folder, f'{layer.lower()}.stl'), layer)
+            if gltf:
+                self.gltf = GltfWriter(os.path.join(folder, f'{name}.gltf'),
+                                       [(layer, LAYER_COLORS[color]) for layer, color in CONDUIT_LAYERS])
+        except Exception:
+            self.abort()
+            raise
+
+    @property
+    def paths(self):
+        return [writer.path for writer in self.stl.values()] + ([self.gltf.path] if self.gltf else [])
+
+    def add(self, conduit):
+        start = time.perf_counter()
+        material = 0 if conduit['tipo'] == CIRCULAR else 1
+        meshes = [mesh for mesh in conduit_meshes(conduit, self.tube, self.chord_tolerance)
+                  if len(mesh.faces)]
+        if not meshes:
+            return
+        if self.origin is None:
+            # Origen redondeado al metro, común a todos los archivos
+            self.origin = np.floor(meshes[0].vertices[0])
+            for writer in self._writers():
+                writer.origin = self.origin.tolist()
+
+        offset, vertices, triangles = 0, [], []
+        for mesh in meshes:
+            vertices.append(mesh.vertices - self.origin)
+            triangles.append(mesh_triangles(outward_faces(mesh.faces, conduit['tipo'])) + offset)
+            offset += len(mesh.vertices)
+        vertices = np.concatenate(vertices)
+        triangles = np.concatenate(triangles)
+        written = time.perf_counter()
+        if self.profile is not None:
+            self.profile.add('3d mesh', written - start, len(triangles))
+
+        size = 0
+        if self.stl:
+            size += self.stl[CONDUIT_LAYERS[material][0]].add(vertices, triangles)
+        if self.gltf is not None:
+            size += self.gltf.add(conduit['id'], material, vertices, triangles)
+        if self.profile is not None:
+            self.profile.add('3d write', time.perf_counter() - written, size)
+
+    def _writers(self):
+        return list(self.stl.values()) + ([self.gltf] if self.gltf is not None else [])
+
+    def close(self):
+        for writer in self._writers():
+            writer.close()
+
+    def abort(self):
+        for writer in self._writers():
+            writer.abort()
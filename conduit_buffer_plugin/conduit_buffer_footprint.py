@@ -0,0 +1,59 @@
+"""
+Dissolved footprint
+Unions the total-width buffers of the network into one footprint per cluster
+"""
+
+from qgis.core import QgsGeometry, QgsSpatialIndex
+
+
+class FootprintDissolver:
+    """Clusters polygons through a spatial index and dissolves each cluster.
+
+    add() looks up the bounding boxes already indexed that overlap the new
+    polygon and joins their clusters (union-find), so dissolve() only has
+    to run a cascaded union (QgsGeometry.unaryUnion) within each cluster
+    instead of over the whole network. Overlapping areas are counted once.
+    """
+
+    def __init__(self):
+        self.index = QgsSpatialIndex()
+        self.geometries = []
+        self.parent = []
+        self.buffer_area = 0.0
+
+    def _root(self, i):
+        while self.parent[i] != i:
+            self.parent[i] = self.parent[self.parent[i]]
+            i = self.parent[i]
+        return i
+
+    def add(self, geom):
+        if geom.isEmpty():
+            return
+        i = len(self.geometries)
+        self.geometries.append(geom)
+        self.parent.append(i)
+        self.buffer_area += geom.area()
+        bbox = geom.boundingBox()
+        for j in self.index.intersects(bbox):
+            a, b = self._root(i), self._root(j)
+            if a != b:
+                self.parent[max(a, b)] = min(a, b)
+        self.index.addFeature(i, bbox)
+
+    def dissolve(self, feedback=None):
+        """Yield (polygon count, dissolved geometry) per cluster.
+
+        Clusters come in the order of their first polygon.
+        """
+        clusters = {}
+        for i in range(len(self.geometries)):
+            clusters.setdefault(self._root(i), []).append(i)
+        for members in clusters.values():
+            if feedback is not None and feedback.isCanceled():
+                return
+            if len(members) == 1:
+                geometry = self.geometries[members[0]]
+            else:
+                geometry = QgsGeometry.unaryUnion([self.geometries[i] for i in members])
+            yield len(members), geometry
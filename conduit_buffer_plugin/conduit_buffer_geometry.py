@@ -0,0 +1,125 @@
+"""
+Concentric buffer engine
+Builds the nested conduit, wall, excavation and total buffers of a conduit
+from a single geometry engine
+"""
+
+import time
+from collections import namedtuple
+
+from qgis.core import QgsGeometry
+
+from .conduit_buffer_mesh import circle_segments
+
+
+# Segmentos por cuarto de círculo de los buffers
+BUFFER_SEGMENTS = 25
+
+ConduitRings = namedtuple('ConduitRings', ['conduit', 'wall', 'excavation', 'total'])
+
+
+def quadrant_segments(radius, tolerance=0.0, maximum=BUFFER_SEGMENTS):
+    """Segments per quarter circle for a buffer of ``radius``.
+
+    With a positive chord ``tolerance`` the count is the smallest that keeps
+    the arcs within it (at least 2, at most ``maximum``); otherwise it is
+    ``maximum``.
+    """
+    if tolerance <= 0:
+        return maximum
+    return circle_segments(radius, tolerance, 8, 4 * maximum) // 4
+
+
+def _from_wkb(wkb):
+    geom = QgsGeometry()
+    geom.fromWkb(wkb)
+    return geom
+
+
+def vertex_count(geom):
+    """Number of vertices of ``geom``, 0 for a NULL geometry."""
+    return 0 if geom.isNull() else geom.constGet().nCoordinates()
+
+
+def concentric_buffers(geom, radii, maximum=BUFFER_SEGMENTS, tolerance=0.0, cache=None, wkb=None):
+    """Buffer one line geometry at several radii.
+
+    The line is converted to GEOS once and every radius is buffered from
+    that engine; repeated radii are only computed once. ``maximum`` is the
+    number of segments per quarter circle, or its upper bound when a chord
+    ``tolerance`` is given. With a BufferCache, buffers found there are not
+    recomputed. Returns a list of QgsGeometry in the same order as
+    ``radii``. A NULL geometry gives empty buffers, as QgsGeometry.buffer()
+    does.
+    """
+    if geom.isNull():
+        return [QgsGeometry() for _ in radii]
+    if cache is not None and wkb is None:
+        wkb = bytes(geom.asWkb())
+    engine = None
+    buffers = {}
+    result = []
+    for radius in radii:
+        if radius not in buffers:
+            segments = quadrant_segments(radius, tolerance, maximum)
+            key = cached = None
+            if cache is not None:
+                key = cache.key(wkb, 'buffer', radius, segments)
+                cached = cache.get(key)
+            if cached is not None:
+                buffers[radius] = _from_wkb(cached)
+            else:
+                if engine is None:
+                    engine = QgsGeometry.createGeometryEngine(geom.constGet())
+                buffered = engine.buffer(radius, segments)
+                if buffered is None:
+                    # El motor GEOS falló: se recurre al buffer de QgsGeometry
+                    buffers[radius] = geom.buffer(radius, segments)
+                else:
+                    buffers[radius] = QgsGeometry(buffered)
+                if cache is not None:
+                    cache.put(key, bytes(buffers[radius].asWkb()))
+        result.append(buffers[radius])
+    return result
+
+
+def conduit_rings(geom, conduit_radius, wall_thickness, excavation_width, tolerance=0.0, cache=None,
+                  profile=None):
+    """Return the ConduitRings of a conduit line.
+
+    The total width polygon is the outer boundary of the excavation, so it
+    reuses the excavation buffer instead of buffering the line again. See
+    quadrant_segments for ``tolerance``; ``cache`` is an optional
+    BufferCache for both the buffers and the rings. With a RunProfile the
+    time of the ``buffer`` and ``difference`` stages is recorded.
+    """
+    start = time.perf_counter()
+    wkb = bytes(geom.asWkb()) if cache is not None else None
+    radii = [conduit_radius, conduit_radius + wall_thickness, conduit_radius + excavation_width]
+    conduit, wall_outer, excavation_outer = concentric_buffers(
+        geom, radii, tolerance=tolerance, cache=cache, wkb=wkb)
+    if profile is not None:
+        buffered = time.perf_counter()
+        profile.add('buffer', buffered - start, vertex_count(geom))
+
+    def ring(outer, outer_radius):
+        if cache is None:
+            return outer.difference(conduit)
+        key = cache.key(wkb, 'ring', outer_radius, conduit_radius,
+                        quadrant_segments(outer_radius, tolerance),
+                        quadrant_segments(conduit_radius, tolerance))
+        cached = cache.get(key)
+        if cached is not None:
+            return _from_wkb(cached)
+        difference = outer.difference(conduit)
+        cache.put(key, bytes(difference.asWkb()))
+        return difference
+
+    rings = ConduitRings(
+        conduit=conduit,
+        wall=ring(wall_outer, radii[1]),
+        excavation=ring(excavation_outer, radii[2]),
+        total=excavation_outer)
+    if profile is not None:
+        profile.add('difference', time.perf_counter() - buffered, 2)
+    return rings
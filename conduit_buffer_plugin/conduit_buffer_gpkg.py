@@ -0,0 +1,137 @@
+"""
+GeoPackage store
+Writes and updates the output layers of the algorithm in a GeoPackage through OGR
+"""
+
+import os
+
+from osgeo import ogr, osr
+from qgis.PyQt.QtCore import QVariant
+
+
+_OGR_TYPES = {
+    QVariant.String: ogr.OFTString,
+    QVariant.Double: ogr.OFTReal,
+    QVariant.Int: ogr.OFTInteger,
+    QVariant.LongLong: ogr.OFTInteger64,
+}
+
+# Lote máximo de valores por sentencia DELETE
+_DELETE_BATCH = 500
+
+
+def _is_null(value):
+    return value is None or (isinstance(value, QVariant) and value.isNull())
+
+
+def _quote(value):
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+class GeoPackageLayers:
+    """Layers of one GeoPackage written through a single OGR connection.
+
+    Layers are created without spatial index so bulk loads stay fast; call
+    create_spatial_indexes once the data is in. Not thread-safe: use it from
+    the thread that runs the algorithm.
+    """
+
+    def __init__(self, path, crs_wkt):
+        self.path = path
+        if os.path.exists(path):
+            self._ds = ogr.Open(path, 1)
+        else:
+            self._ds = ogr.GetDriverByName('GPKG').CreateDataSource(path)
+        if self._ds is None:
+            raise IOError(f'Cannot open GeoPackage {path}')
+        self._srs = None
+        if crs_wkt:
+            self._srs = osr.SpatialReference()
+            self._srs.ImportFromWkt(crs_wkt)
+            if hasattr(osr, 'OAMS_TRADITIONAL_GIS_ORDER'):
+                self._srs.SetAxisMappingStrategy(osr.OAMS_TRADITIONAL_GIS_ORDER)
+        self._layers = {}
+        self.created = []
+        self._in_transaction = False
+
+    def add_layer(self, name, fields, geometry_type=ogr.wkbPolygon):
+        """Open layer ``name``, creating it with ``fields`` (QgsFields) if missing.
+
+        Fields missing from an existing layer are appended to it.
+        """
+        layer = self._ds.GetLayerByName(name)
+        if layer is None:
+            srs = self._srs if geometry_type != ogr.wkbNone else None
+            layer = self._ds.CreateLayer(name, srs, geometry_type,
+                                         ['SPATIAL_INDEX=NO', 'FID=fid'])
+            if layer is None:
+                raise IOError(f'Cannot create layer {name} in {self.path}')
+            self.created.append(name)
+        definition = layer.GetLayerDefn()
+        for field in fields:
+            if definition.GetFieldIndex(field.name()) >= 0:
+                continue
+            field_definition = ogr.FieldDefn(field.name(), _OGR_TYPES.get(field.type(), ogr.OFTString))
+            if field.type() == QVariant.String and field.length() > 0:
+                field_definition.SetWidth(field.length())
+            layer.CreateField(field_definition)
+        self._layers[name] = layer
+        return layer
+
+    def begin(self):
+        if not self._in_transaction:
+            self._ds.StartTransaction()
+            self._in_transaction = True
+
+    def commit(self):
+        if self._in_transaction:
+            self._ds.CommitTransaction()
+            self._in_transaction = False
+
+    def add(self, name, wkb, attributes):
+        """Append one feature; ``wkb`` may be None for attribute tables."""
+        layer = self._layers[name]
+        feature = ogr.Feature(layer.GetLayerDefn())
+        for i, value in enumerate(attributes):
+            if _is_null(value):
+                feature.SetFieldNull(i)
+            else:
+                feature.SetField(i, value)
+        if wkb is not None:
+            feature.SetGeometryDirectly(ogr.CreateGeometryFromWkb(wkb))
+        if layer.CreateFeature(feature) != 0:
+            raise IOError(f'Cannot write feature to {name} in {self.path}')
+
+    def add_feature(self, name, feature):
+        """Append a QgsFeature whose attributes follow the fields of ``name``."""
+        self.add(name, bytes(feature.geometry().asWkb()), feature.attributes())
+
+    def rows(self, name, field_names):
+        """Yield tuples with the values of ``field_names`` for every feature of ``name``."""
+        layer = self._layers[name]
+        layer.ResetReading()
+        for feature in layer:
+            yield tuple(feature.GetField(field) for field in field_names)
+
+    def delete_where(self, name, field, values):
+        """Delete every feature of ``name`` whose ``field`` is in ``values``."""
+        values = list(values)
+        for i in range(0, len(values), _DELETE_BATCH):
+            batch = ', '.join(_quote(value) for value in values[i:i + _DELETE_BATCH])
+            self._ds.ExecuteSQL(f'DELETE FROM "{name}" WHERE "{field}" IN ({batch})')
+
+    def create_index(self, name, field):
+        self._ds.ExecuteSQL(f'CREATE INDEX IF NOT EXISTS "idx_{name}_{field}" ON "{name}" ("{field}")')
+
+    def create_spatial_indexes(self, names):
+        """Build the R-tree of each polygon layer in ``names``."""
+        for name in names:
+            layer = self._layers[name]
+            column = layer.GetGeometryColumn()
+            if column:
+                self._ds.ExecuteSQL(f"SELECT CreateSpatialIndex('{name}', '{column}')")
+
+    def close(self):
+        self.commit()
+        self._layers = {}
+        self._ds = None
@@ -0,0 +1,106 @@
+"""
+Incremental processing
+Keeps the outputs of previous runs in a GeoPackage and updates only changed conduits
+"""
+
+import hashlib
+import os
+
+import numpy as np
+from osgeo import ogr
+from qgis.PyQt.QtCore import QVariant
+from qgis.core import QgsField, QgsFields
+
+from .conduit_buffer_cache import BufferCache
+from .conduit_buffer_gpkg import GeoPackageLayers
+
+
+class IncrementalStore:
+    """Per-conduit fingerprints and outputs of previous runs.
+
+    Each conduit gets a fingerprint of its geometry, width, height, inverts
+    (every vertex level for chained runs) and the run parameters, stored in the ``fingerprints`` table of the
+    GeoPackage next to the output layers. On the next run only added or
+    changed conduits are rewritten and deleted ones are removed. DXF
+    entities are kept per conduit in a fragment store beside the
+    GeoPackage so the DXF can be rebuilt without meshing unchanged
+    conduits.
+    """
+
+    FINGERPRINTS = 'fingerprints'
+
+    def __init__(self, path, layers, crs_wkt, parameters):
+        self.parameters = parameters
+        self.gpkg = GeoPackageLayers(path, crs_wkt)
+        self.layer_names = list(layers)
+        for name, fields in layers.items():
+            self.gpkg.add_layer(name, fields)
+            self.gpkg.create_index(name, 'id')
+
+        fingerprint_fields = QgsFields()
+        fingerprint_fields.append(QgsField('id', QVariant.String, len=254))
+        fingerprint_fields.append(QgsField('huella', QVariant.String, len=32))
+        self.gpkg.add_layer(self.FINGERPRINTS, fingerprint_fields, ogr.wkbNone)
+        self.gpkg.create_index(self.FINGERPRINTS, 'id')
+
+        self.previous = dict(self.gpkg.rows(self.FINGERPRINTS, ['id', 'huella']))
+        self.fragments = BufferCache(os.path.splitext(path)[0] + '_dxf.sqlite')
+        self.seen = set()
+        self.added = self.changed = self.unchanged = self.deleted = 0
+        self.gpkg.begin()
+
+    def fingerprint(self, record):
+        digest = hashlib.blake2b(bytes(record['geom'].asWkb()), digest_size=16)
+        digest.update(repr((record['width_mm'], record['height_mm'],
+                            record['us_invert'], record['ds_invert'],
+                            self.parameters)).encode())
+        if record.get('z') is not None:
+            # Tramos encadenados: las cotas intermedias de cada miembro también cuentan
+            digest.update(np.asarray(record['z'], dtype='<f8').tobytes())
+        return digest.hexdigest()
+
+    def classify(self, records):
+        """Fingerprint ``records`` and flag the ones whose outputs are up to date.
+
+        Yields every record with ``fingerprint`` set and ``unchanged`` True
+        when the stored outputs can be kept. Stored rows of changed
+        conduits are removed so they can be written again.
+        """
+        for record in records:
+            conduit_id = record['id']
+            record['fingerprint'] = self.fingerprint(record)
+            record['unchanged'] = self.previous.get(conduit_id) == record['fingerprint']
+            self.seen.add(conduit_id)
+            if record['unchanged']:
+                self.unchanged += 1
+            elif conduit_id in self.previous:
+                self.changed += 1
+                self._delete([conduit_id])
+            else:
+                self.added += 1
+            yield record
+
+    def write(self, record, features):
+        """Store the output features of a reprocessed record by layer name."""
+        for name, feature in features.items():
+            self.gpkg.add_feature(name, feature)
+        self.gpkg.add(self.FINGERPRINTS, None, [record['id'], record['fingerprint']])
+
+    def _delete(self, ids):
+        for name in self.layer_names + [self.FINGERPRINTS]:
+            self.gpkg.delete_where(name, 'id', ids)
+
+    def close(self, canceled=False):
+        """Remove conduits missing from this run, commit and build spatial indexes.
+
+        A canceled run has not seen every conduit, so nothing is deleted.
+        """
+        if not canceled:
+            deleted = set(self.previous) - self.seen
+            self._delete(deleted)
+            self.deleted = len(deleted)
+        self.gpkg.commit()
+        self.gpkg.create_spatial_indexes([name for name in self.gpkg.created
+                                          if name in self.layer_names])
+        self.gpkg.close()
+        self.fragments.close()
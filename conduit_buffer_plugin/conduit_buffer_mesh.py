@@ -0,0 +1,242 @@
+"""
+Conduit mesh generator
+Builds the vertex and face arrays of the 3D conduit solids with NumPy
+"""
+
+from collections import namedtuple
+from functools import lru_cache
+import math
+
+import numpy as np
+
+
+CIRCULAR = 'Circular'
+RECTANGULAR = 'Rectangular'
+
+# Caras por segmento: índices de 4 vértices, los triángulos repiten el 3ro
+ConduitMesh = namedtuple('ConduitMesh', ['vertices', 'faces', 'segments'])
+ProfileTemplate = namedtuple('ProfileTemplate',
+                             ['scale', 'lateral', 'vertical', 'faces', 'sides', 'start_cap', 'end_cap'])
+
+# Límite del factor de inglete en las uniones de tubos continuos
+MITER_LIMIT = 2.0
+
+# Lados del polígono de las secciones circulares
+DXF_SEGMENTS = 16
+MAX_DXF_SEGMENTS = 64
+
+
+def circle_segments(radius, tolerance, minimum=8, maximum=MAX_DXF_SEGMENTS):
+    """Sides of the regular polygon that approximates a circle of ``radius``
+    with a chord deviation of at most ``tolerance``.
+
+    The result is a multiple of 4 clamped to [minimum, maximum].
+    """
+    if radius <= tolerance:
+        return minimum
+    # Flecha de la cuerda: radius * (1 - cos(pi / n)) <= tolerance
+    n = math.ceil(math.pi / math.acos(1 - tolerance / radius))
+    n = 4 * math.ceil(n / 4)
+    return max(minimum, min(maximum, n))
+
+
+@lru_cache(maxsize=1024)
+def profile_template(section, width_m, height_m, segments=DXF_SEGMENTS):
+    """Return the cached unit profile of a section.
+
+    A profile vertex sits at ``scale * lateral`` along the segment normal
+    and ``vertical`` above the invert. ``faces`` indexes a block of start
+    vertices followed by end vertices, so one template serves every segment
+    of every conduit with the same dimensions. ``sides``, ``start_cap`` and
+    ``end_cap`` split the same faces for continuous tubes.
+    """
+    if section == CIRCULAR:
+        n = segments
+        radius = width_m / 2
+        lateral, vertical = [], []
+        for j in range(n):
+            a = 2 * math.pi * j / n
+            lateral.append(math.cos(a))
+            vertical.append(radius * math.sin(a))
+        # Laterales
+        sides = [(j, (j + 1) % n, n + (j + 1) % n, n + j) for j in range(n)]
+        # Tapas (fan triangulation)
+        start_cap = [(0, j, j + 1, j + 1) for j in range(1, n - 1)]
+        end_cap = [(n, n + j + 1, n + j, n + j) for j in range(1, n - 1)]
+        faces = sides + start_cap + end_cap
+        scale = radius
+    else:
+        hw, hh = width_m / 2, height_m / 2
+        lateral = [1.0, -1.0, -1.0, 1.0]
+        vertical = [-hh, -hh, hh, hh]
+        # 6 caras, cada una dividida en 2 triángulos
+        start_cap = [(0, 1, 2, 2), (0, 2, 3, 3)]
+        end_cap = [(4, 6, 5, 5), (4, 7, 6, 6)]
+        sides = [
+            (0, 4, 5, 5), (0, 5, 1, 1),  # Bottom
+            (3, 2, 6, 6), (3, 6, 7, 7),  # Top
+            (0, 3, 7, 7), (0, 7, 4, 4),  # Right
+            (1, 5, 6, 6), (1, 6, 2, 2),  # Left
+        ]
+        faces = start_cap + end_cap + sides
+        scale = hw
+
+    template = ProfileTemplate(scale, np.array(lateral), np.array(vertical),
+                               *(np.array(f, dtype=np.int64).reshape(-1, 4)
+                                 for f in (faces, sides, start_cap, end_cap)))
+    for array in template[1:]:
+        array.setflags(write=False)
+    return template
+
+
+def invert_levels(xy, us_invert, ds_invert):
+    """Interpolate the invert level at every vertex by 2D distance along the line."""
+    return part_levels([xy], us_invert, ds_invert)[0]
+
+
+def part_levels(parts, us_invert, ds_invert):
+    """Invert levels of every vertex of a multipart line.
+
+    Distances run along all ``parts`` in order, so the levels go from
+    ``us_invert`` at the first vertex to ``ds_invert`` at the last one.
+    Returns one array per part.
+    """
+    cumulative, offset = [], 0.0
+    for xy in parts:
+        xy = np.asarray(xy, dtype=float).reshape(-1, 2)
+        if not len(xy):
+            cumulative.append(np.empty(0))
+            continue
+        d = np.sqrt(np.diff(xy[:, 0]) ** 2 + np.diff(xy[:, 1]) ** 2)
+        cumulative_dist = offset + np.concatenate(([0.0], np.cumsum(d)))
+        offset = cumulative_dist[-1]
+        cumulative.append(cumulative_dist)
+    total_length_2d = offset
+    levels = []
+    for cumulative_dist in cumulative:
+        if total_length_2d > 0:
+            ratio = cumulative_dist / total_length_2d
+        else:
+            ratio = np.zeros_like(cumulative_dist)
+        levels.append(us_invert + (ds_invert - us_invert) * ratio)
+    return levels
+
+
+def conduit_mesh(xy, z, section, width_m, height_m, segments=DXF_SEGMENTS):
+    """Mesh a conduit polyline as one closed prism per segment.
+
+    ``xy`` is a (k, 2) array of vertices and ``z`` their invert levels
+    (see invert_levels). All segments are transformed in
+    a single NumPy operation; zero-length segments are dropped. Returns a
+    ConduitMesh whose faces index rows of ``vertices``.
+    """
+    xy = np.asarray(xy, dtype=float).reshape(-1, 2)
+    template = profile_template(section, width_m, height_m, segments)
+    k = len(template.lateral)
+
+    if len(xy) < 2:
+        return ConduitMesh(np.empty((0, 3)), np.empty((0, 4), dtype=np.int64), 0)
+
+    z = np.asarray(z, dtype=float)
+    dx = np.diff(xy[:, 0])
+    dy = np.diff(xy[:, 1])
+    seg_len = np.sqrt(dx ** 2 + dy ** 2)
+    valid = seg_len != 0
+    start, end = xy[:-1][valid], xy[1:][valid]
+    z1, z2 = z[:-1][valid], z[1:][valid]
+    dx, dy, seg_len = dx[valid], dy[valid], seg_len[valid]
+    count = len(seg_len)
+
+    # Normal horizontal escalada por el perfil: (m, 1) × (k,) → (m, k)
+    off_x = (template.scale * (-dy / seg_len))[:, None] * template.lateral
+    off_y = (template.scale * (dx / seg_len))[:, None] * template.lateral
+
+    vertices = np.empty((count, 2, k, 3))
+    vertices[:, 0, :, 0] = start[:, 0:1] + off_x
+    vertices[:, 0, :, 1] = start[:, 1:2] + off_y
+    vertices[:, 0, :, 2] = z1[:, None] + template.vertical
+    vertices[:, 1, :, 0] = end[:, 0:1] + off_x
+    vertices[:, 1, :, 1] = end[:, 1:2] + off_y
+    vertices[:, 1, :, 2] = z2[:, None] + template.vertical
+
+    faces = template.faces[None, :, :] + (np.arange(count) * 2 * k)[:, None, None]
+    return ConduitMesh(vertices.reshape(-1, 3), faces.reshape(-1, 4), count)
+
+
+def tube_mesh(xy, z, section, width_m, height_m, segments=DXF_SEGMENTS, miter_limit=MITER_LIMIT):
+    """Mesh a conduit polyline as one continuous closed tube.
+
+    Consecutive segments share the profile ring at their common vertex,
+    which is oriented along the bisector of both segments and widened by
+    the miter factor (at most ``miter_limit``; 1 gives averaged joints).
+    Only the two ends of the conduit are capped.
+    """
+    xy = np.asarray(xy, dtype=float).reshape(-1, 2)
+    template = profile_template(section, width_m, height_m, segments)
+    k = len(template.lateral)
+
+    if len(xy) >= 2:
+        z = np.asarray(z, dtype=float)
+        keep = np.concatenate(([True], np.any(np.diff(xy, axis=0) != 0, axis=1)))
+        xy, z = xy[keep], z[keep]
+    if len(xy) < 2:
+        return ConduitMesh(np.empty((0, 3)), np.empty((0, 4), dtype=np.int64), 0)
+
+    count = len(xy) - 1
+    d = np.diff(xy, axis=0)
+    d /= np.sqrt(d[:, 0] ** 2 + d[:, 1] ** 2)[:, None]
+    normals = np.column_stack((-d[:, 1], d[:, 0]))
+
+    # Normal de cada estación: bisectriz de los segmentos adyacentes
+    station = np.vstack((normals[:1], normals[:-1] + normals[1:], normals[-1:]))
+    length = np.sqrt(station[:, 0] ** 2 + station[:, 1] ** 2)
+    reversed_ = length < 1e-9
+    station[reversed_] = np.vstack((normals[:1], normals))[reversed_]
+    length[reversed_] = 1.0
+    # |n1 + n2| = 2 cos(θ/2), factor de inglete = 1 / cos(θ/2)
+    miter = np.ones_like(length)
+    miter[1:-1] = np.minimum(2.0 / np.maximum(length[1:-1], 1e-9), miter_limit)
+    miter[reversed_] = 1.0
+    station *= (miter / length)[:, None]
+
+    vertices = np.empty((count + 1, k, 3))
+    vertices[:, :, 0] = xy[:, 0:1] + (template.scale * station[:, 0])[:, None] * template.lateral
+    vertices[:, :, 1] = xy[:, 1:2] + (template.scale * station[:, 1])[:, None] * template.lateral
+    vertices[:, :, 2] = z[:, None] + template.vertical
+
+    sides = template.sides[None, :, :] + (np.arange(count) * k)[:, None, None]
+    faces = np.concatenate((template.start_cap,
+                            sides.reshape(-1, 4),
+                            template.end_cap + (count - 1) * k))
+    return ConduitMesh(vertices.reshape(-1, 3), faces, count)
+
+
+def conduit_meshes(conduit, tube=False, chord_tolerance=0.0):
+    """Mesh every part of a conduit dict, one ConduitMesh per part.
+
+    ``conduit`` holds ``tipo``, ``width_mm``, ``height_mm`` and ``parts``
+    (a list of (xy, z) arrays). With ``tube`` the parts are continuous
+    tubes, otherwise prisms per segment; a ``chord_tolerance`` greater than
+    0 sets the sides of circular sections from their radius.
+    """
+    width_m = conduit['width_mm'] / 1000.0
+    height_m = conduit['height_mm'] / 1000.0
+    mesher = tube_mesh if tube else conduit_mesh
+    segments = DXF_SEGMENTS
+    if conduit['tipo'] == CIRCULAR and chord_tolerance > 0:
+        segments = circle_segments(width_m / 2, chord_tolerance)
+    return [mesher(xy, z, conduit['tipo'], width_m, height_m, segments)
+            for xy, z in conduit['parts']]
+
+
+def mesh_triangles(faces):
+    """Split mesh faces into an (n, 3) array of triangles.
+
+    Quads give the triangles (0, 1, 2) and (0, 2, 3); faces that repeat
+    their third vertex give one triangle. Degenerate triangles are dropped.
+    """
+    faces = np.asarray(faces).reshape(-1, 4)
+    quads = faces[faces[:, 2] != faces[:, 3]]
+    triangles = np.concatenate((faces[:, :3], quads[:, [0, 2, 3]]))
+    a, b, c = triangles.T
+    return triangles[(a != b) & (b != c) & (a != c)]
@@ -0,0 +1,85 @@
+"""
+Network topology
+Chains conduits that continue each other into single pipe runs
+"""
+
+import math
+
+
+NODE_TOLERANCE = 0.01        # metros entre extremos considerados el mismo nodo
+ANGLE_TOLERANCE = 5.0        # grados de desvío máximo entre tramos colineales
+INVERT_TOLERANCE = 0.01      # metros de salto máximo de cota en la unión
+
+
+def node_key(point, tolerance=NODE_TOLERANCE):
+    """Hashable key of the node at ``point``; points closer than ``tolerance`` usually share it."""
+    return (round(point[0] / tolerance), round(point[1] / tolerance))
+
+
+def _direction(a, b):
+    return math.atan2(b[1] - a[1], b[0] - a[0])
+
+
+def chain_conduits(conduits, node_tolerance=NODE_TOLERANCE,
+                   angle_tolerance=ANGLE_TOLERANCE, invert_tolerance=INVERT_TOLERANCE):
+    """Group conduits into continuous runs.
+
+    ``conduits`` is a sequence of dicts with ``xy`` (list of (x, y) in flow
+    direction, or None when the conduit cannot be chained), ``section``
+    (any hashable key of section type and dimensions), ``us_invert`` and
+    ``ds_invert``. Conduit A continues into B when A ends on the node where
+    B starts, no other conduit touches that node, both have the same
+    section, the inverts match and the joint deviates less than
+    ``angle_tolerance`` degrees.
+
+    Returns a list of chains, each a list of indices into ``conduits`` in
+    flow order. Every conduit appears in exactly one chain.
+    """
+    starts, ends, degree = {}, {}, {}
+    for i, conduit in enumerate(conduits):
+        xy = conduit['xy']
+        if not xy or len(xy) < 2:
+            continue
+        head, tail = node_key(xy[0], node_tolerance), node_key(xy[-1], node_tolerance)
+        starts.setdefault(head, []).append(i)
+        ends.setdefault(tail, []).append(i)
+        degree[head] = degree.get(head, 0) + 1
+        degree[tail] = degree.get(tail, 0) + 1
+
+    max_angle = math.radians(angle_tolerance)
+    following, previous = {}, {}
+    for node, incoming in ends.items():
+        outgoing = starts.get(node, [])
+        if len(incoming) != 1 or len(outgoing) != 1 or degree[node] != 2:
+            continue
+        a, b = incoming[0], outgoing[0]
+        if a == b:
+            continue
+        first, second = conduits[a], conduits[b]
+        if first['section'] != second['section']:
+            continue
+        if first['ds_invert'] is None or second['us_invert'] is None:
+            continue
+        if abs(first['ds_invert'] - second['us_invert']) > invert_tolerance:
+            continue
+        turn = _direction(first['xy'][-2], first['xy'][-1]) - _direction(second['xy'][0], second['xy'][1])
+        turn = abs((turn + math.pi) % (2 * math.pi) - math.pi)
+        if turn > max_angle:
+            continue
+        following[a] = b
+        previous[b] = a
+
+    def follow(i):
+        chain = [i]
+        visited.add(i)
+        while following.get(chain[-1]) is not None and following[chain[-1]] not in visited:
+            chain.append(following[chain[-1]])
+            visited.add(chain[-1])
+        return chain
+
+    visited = set()
+    chains = [follow(i) for i in range(len(conduits)) if i not in previous]
+    # Anillos cerrados: no tienen inicio, se cortan en el primer conducto
+    chains += [follow(i) for i in range(len(conduits)) if i not in visited]
+    chains.sort(key=lambda chain: chain[0])
+    return chains
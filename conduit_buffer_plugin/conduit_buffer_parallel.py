@@ -0,0 +1,101 @@
+"""
+Parallel execution helpers
+Runs the per-conduit buffering on a pool of worker threads and overlaps
+the DXF output with it on a background thread
+"""
+
+import queue
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+
+# Registros en espera como máximo entre el bucle de buffers y el escritor
+QUEUE_SIZE = 256
+
+
+def chunked(iterable, size):
+    """Yield successive lists of at most ``size`` items from ``iterable``."""
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def ordered_map(func, chunks, workers, feedback=None):
+    """Apply ``func`` to every chunk and yield the results in input order.
+
+    With ``workers`` > 1 the chunks run on a thread pool. PyQGIS releases
+    the GIL around GEOS calls, so buffering scales across cores. At most
+    ``2 * workers`` chunks are in flight, which keeps memory bounded on
+    large inputs. Stops early when ``feedback`` is canceled.
+    """
+    if workers <= 1:
+        for chunk in chunks:
+            if feedback is not None and feedback.isCanceled():
+                return
+            yield func(chunk)
+        return
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        try:
+            for chunk in chunks:
+                if feedback is not None and feedback.isCanceled():
+                    return
+                pending.append(executor.submit(func, chunk))
+                if len(pending) >= 2 * workers:
+                    yield pending.popleft().result()
+            while pending:
+                if feedback is not None and feedback.isCanceled():
+                    return
+                yield pending.popleft().result()
+        finally:
+            for future in pending:
+                future.cancel()
+
+
+class BackgroundConsumer:
+    """Hands items to ``func`` on a background thread through a bounded queue.
+
+    put() blocks while ``maxsize`` items are waiting, so a slow consumer
+    throttles the producer instead of letting the queue grow. An exception
+    raised by ``func`` stops the processing; it is re-raised by the next
+    put() or by close(), and the remaining items are discarded.
+    """
+
+    _DONE = object()
+
+    def __init__(self, func, maxsize=QUEUE_SIZE):
+        self._func = func
+        self._queue = queue.Queue(maxsize)
+        self._error = None
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is self._DONE:
+                return
+            if self._error is not None:
+                continue
+            try:
+                self._func(item)
+            except Exception as e:
+                self._error = e
+
+    def put(self, item):
+        if self._error is not None:
+            raise self._error
+        self._queue.put(item)
+
+    def close(self):
+        """Wait until every queued item is processed."""
+        self._queue.put(self._DONE)
+        self._thread.join()
+        if self._error is not None:
+            raise self._error
@@ -0,0 +1,87 @@
+"""
+Run profile
+Per-stage timing, call counts and slowest conduits of an algorithm run
+"""
+
+import heapq
+import json
+import threading
+import time
+from collections import OrderedDict
+
+
+# Conductos más lentos listados en el resumen
+OUTLIERS = 10
+
+
+class RunProfile:
+    """Wall time, calls and item counts (vertices, faces...) per stage.
+
+    Stages are accumulated with add() or by wrapping an iterable with
+    timed(). Stages that run on worker threads add up the time of every
+    thread, so they can exceed the run's wall time. conduit() records the
+    buffering time of one conduit and keeps the ``outliers`` slowest.
+    Safe to share between threads.
+    """
+
+    def __init__(self, outliers=OUTLIERS):
+        self.outliers = outliers
+        self.stages = OrderedDict()
+        self.slowest = []
+        self._lock = threading.Lock()
+        self._start = time.perf_counter()
+        self.elapsed = 0.0
+
+    def add(self, name, seconds, items=0):
+        with self._lock:
+            stage = self.stages.setdefault(name, [0.0, 0, 0])
+            stage[0] += seconds
+            stage[1] += 1
+            stage[2] += items
+
+    def timed(self, name, iterable):
+        """Yield from ``iterable``, adding the time spent producing each item to ``name``."""
+        iterator = iter(iterable)
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            self.add(name, time.perf_counter() - start, 1)
+            yield item
+
+    def conduit(self, conduit_id, seconds, vertices):
+        with self._lock:
+            entry = (seconds, str(conduit_id), vertices)
+            if len(self.slowest) < self.outliers:
+                heapq.heappush(self.slowest, entry)
+            elif entry > self.slowest[0]:
+                heapq.heapreplace(self.slowest, entry)
+
+    def stop(self):
+        self.elapsed = time.perf_counter() - self._start
+
+    def summary(self):
+        """Lines of the summary reported through feedback."""
+        lines = [f'Run profile ({self.elapsed:.2f} s):']
+        for name, (seconds, calls, items) in self.stages.items():
+            lines.append(f'  {name:<12} {seconds:9.3f} s  {calls:>9} calls  {items:>11} items')
+        if self.slowest:
+            lines.append('Slowest conduits (buffer time):')
+            for seconds, conduit_id, vertices in sorted(self.slowest, reverse=True):
+                lines.append(f'  {conduit_id}: {seconds * 1000:.1f} ms, {vertices} vertices')
+        return lines
+
+    def to_dict(self):
+        return {
+            'elapsed_s': self.elapsed,
+            'stages': {name: {'seconds': seconds, 'calls': calls, 'items': items}
+                       for name, (seconds, calls, items) in self.stages.items()},
+            'slowest': [{'id': conduit_id, 'seconds': seconds, 'vertices': vertices}
+                        for seconds, conduit_id, vertices in sorted(self.slowest, reverse=True)]
+        }
+
+    def write(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, indent=2)
@@ -0,0 +1,117 @@
+"""
+Conduit reader
+Fetches the conduit attributes needed by the algorithm in columnar batches
+"""
+
+from collections import namedtuple
+
+import numpy as np
+from qgis.PyQt.QtCore import QVariant
+from qgis.core import QgsFeatureRequest, QgsRectangle
+
+from .conduit_buffer_tiles import tile_contains
+
+
+# Entidades por lote leído del proveedor
+BATCH_SIZE = 1000
+
+ConduitBatch = namedtuple('ConduitBatch', ['index', 'ids', 'width', 'height',
+                                           'us_invert', 'ds_invert', 'geometries'])
+
+
+def _number(value):
+    if value is None or (isinstance(value, QVariant) and value.isNull()):
+        return np.nan
+    return float(value)
+
+
+def classify_sections(width_mm, height_mm):
+    """Vectorized section classification of a batch.
+
+    A conduit is circular when its height is set and within 1 mm of its
+    width. Returns the boolean ``circular`` array and the effective
+    heights, which fall back to the width when the height is null or 0.
+    """
+    has_height = ~np.isnan(height_mm) & (height_mm != 0)
+    with np.errstate(invalid='ignore'):
+        circular = has_height & (np.abs(width_mm - height_mm) < 1)
+    return circular, np.where(has_height, height_mm, width_mm)
+
+
+class ConduitReader:
+    """Reads conduits in batches of NumPy columns.
+
+    Field indices are resolved once and the feature request only asks the
+    provider for the id, width, height and invert fields, which matters
+    on wide InfoWorks exports. Missing ``id`` falls back to the feature
+    id, a missing height to null and missing inverts to 0; null values
+    are NaN.
+
+    With a ``tile`` (see tile_grid) the request is filtered to the tile
+    rectangle and only conduits whose centroid lies in the tile are read,
+    so each conduit belongs to one tile of the grid. ``count`` holds the
+    number of conduits read so far.
+    """
+
+    def __init__(self, source, width_field, tile=None, batch_size=BATCH_SIZE):
+        self.source = source
+        self.tile = tile
+        self.batch_size = batch_size
+        self.count = 0
+        fields = source.fields()
+        self._id = fields.indexFromName('id')
+        self._width = fields.indexFromName(width_field)
+        self._height = fields.indexFromName('condheight')
+        self._us_invert = fields.indexFromName('us_invert')
+        self._ds_invert = fields.indexFromName('ds_invert')
+        attributes = [i for i in (self._id, self._width, self._height,
+                                  self._us_invert, self._ds_invert) if i >= 0]
+        self.request = QgsFeatureRequest().setSubsetOfAttributes(attributes)
+        if tile is not None:
+            self.request.setFilterRect(QgsRectangle(tile.xmin, tile.ymin, tile.xmax, tile.ymax))
+            extent = source.sourceExtent()
+            self._extent = (extent.xMinimum(), extent.yMinimum(), extent.xMaximum(), extent.yMaximum())
+
+    def batches(self, feedback=None, start=0):
+        """Yield ConduitBatch tuples of at most ``batch_size`` features.
+
+        Features are numbered from ``start`` in the ``index`` column.
+        """
+        columns = self._empty()
+        for feature in self.source.getFeatures(self.request):
+            if feedback is not None and feedback.isCanceled():
+                return
+            if self.tile is not None:
+                centroid = feature.geometry().centroid().asPoint()
+                if not tile_contains(self.tile, centroid.x(), centroid.y(), self._extent):
+                    continue
+            attributes = feature.attributes()
+            columns[0].append(start + self.count)
+            self.count += 1
+            columns[1].append(str(attributes[self._id]) if self._id >= 0 else str(feature.id()))
+            columns[2].append(_number(attributes[self._width]) if self._width >= 0 else np.nan)
+            columns[3].append(_number(attributes[self._height]) if self._height >= 0 else np.nan)
+            columns[4].append(_number(attributes[self._us_invert]) if self._us_invert >= 0 else 0.0)
+            columns[5].append(_number(attributes[self._ds_invert]) if self._ds_invert >= 0 else 0.0)
+            columns[6].append(feature.geometry())
+            if len(columns[0]) >= self.batch_size:
+                yield self._batch(columns)
+                columns = self._empty()
+        if columns[0]:
+            yield self._batch(columns)
+
+    @staticmethod
+    def _empty():
+        return [[] for _ in ConduitBatch._fields]
+
+    @staticmethod
+    def _batch(columns):
+        index, ids, width, height, us_invert, ds_invert, geometries = columns
+        return ConduitBatch(
+            index=np.array(index),
+            ids=ids,
+            width=np.array(width, dtype=float),
+            height=np.array(height, dtype=float),
+            us_invert=np.array(us_invert, dtype=float),
+            ds_invert=np.array(ds_invert, dtype=float),
+            geometries=geometries)
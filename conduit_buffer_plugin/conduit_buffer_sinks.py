@@ -0,0 +1,45 @@
+"""
+Batched sinks
+Collects output features and writes them to the Processing sinks in batches
+"""
+
+from qgis.core import QgsFeatureSink
+
+
+# Entidades por llamada a addFeatures
+SINK_BATCH_SIZE = 1000
+
+
+class BatchedSinks:
+    """Output features queued per sink and flushed with addFeatures.
+
+    ``sinks`` maps output keys to feature sinks; None sinks (outputs the
+    user skipped) are ignored. Each sink receives its features in runs of
+    ``batch_size`` instead of one call per row, so a GeoPackage or
+    shapefile destination is not written in four interleaved streams.
+    Call flush() once the last feature has been added.
+    """
+
+    def __init__(self, sinks, batch_size=SINK_BATCH_SIZE):
+        self.sinks = {key: sink for key, sink in sinks.items() if sink is not None}
+        self.batch_size = max(1, batch_size)
+        self._pending = {key: [] for key in self.sinks}
+
+    def add(self, features):
+        """Queue ``features``, a dict of QgsFeature keyed like ``sinks``."""
+        for key, feature in features.items():
+            pending = self._pending.get(key)
+            if pending is None:
+                continue
+            pending.append(feature)
+            if len(pending) >= self.batch_size:
+                self._flush(key)
+
+    def _flush(self, key):
+        if self._pending[key]:
+            self.sinks[key].addFeatures(self._pending[key], QgsFeatureSink.FastInsert)
+            self._pending[key] = []
+
+    def flush(self):
+        for key in self.sinks:
+            self._flush(key)
@@ -0,0 +1,41 @@
+"""
+Tile grid
+Splits the extent of the input layer into square tiles processed one at a time
+"""
+
+import math
+from collections import namedtuple
+
+
+Tile = namedtuple('Tile', ['column', 'row', 'xmin', 'ymin', 'xmax', 'ymax'])
+
+
+def tile_grid(xmin, ymin, xmax, ymax, size):
+    """Return the tiles of ``size`` map units covering the extent, row by row.
+
+    Neighbouring tiles share the exact same edge coordinate and the last
+    column and row end on the extent maximum.
+    """
+    columns = max(1, int(math.ceil((xmax - xmin) / size)))
+    rows = max(1, int(math.ceil((ymax - ymin) / size)))
+    tiles = []
+    for row in range(rows):
+        y0 = ymin + row * size
+        y1 = ymax if row == rows - 1 else ymin + (row + 1) * size
+        for column in range(columns):
+            x0 = xmin + column * size
+            x1 = xmax if column == columns - 1 else xmin + (column + 1) * size
+            tiles.append(Tile(column, row, x0, y0, x1, y1))
+    return tiles
+
+
+def tile_contains(tile, x, y, extent):
+    """True when (x, y) belongs to ``tile``.
+
+    Tiles are half-open, [xmin, xmax) x [ymin, ymax), except on the maximum
+    edges of ``extent`` (xmin, ymin, xmax, ymax), so every point of the
+    extent belongs to exactly one tile.
+    """
+    in_x = tile.xmin <= x < tile.xmax or (x == tile.xmax == extent[2])
+    in_y = tile.ymin <= y < tile.ymax or (y == tile.ymax == extent[3])
+    return in_x and in_y